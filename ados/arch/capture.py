@@ -0,0 +1,100 @@
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from queue import SimpleQueue
+from typing import IO, Iterator, NamedTuple, Optional
+
+from websockets.typing import Data
+
+from ados.config import ADOSConfig
+
+_log = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0
+
+
+# A single frame in a capture file. Direction is "in" for frames received from the server,
+# and "out" for frames sent by the client.
+class CapturedFrame(NamedTuple):
+    time: float
+    direction: str
+    frame: str
+
+
+# Records every frame sent and received by a SocketClient to gzip-compressed JSON lines files in
+# the data directory. Recording only queues the frame; compression and file I/O happen on a
+# background thread. Files are rotated after socket_capture_max_bytes of (uncompressed) frames,
+# and only the newest socket_capture_max_files files are kept.
+class CaptureRecorder:
+
+    def __init__(self, config: ADOSConfig, slot_name: str):
+        safe_slot = re.sub(r"[^A-Za-z0-9_.-]", "_", slot_name)
+        self._prefix = os.path.join(config.data_path, f"{config.archipelago_room}_{safe_slot}_capture_")
+        self._max_bytes = config.socket_capture_max_bytes
+        self._max_files = config.socket_capture_max_files
+
+        self._queue: SimpleQueue[Optional[CapturedFrame]] = SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, name=f"ados-capture-{safe_slot}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, direction: str, frame: Data) -> None:
+        text = frame if isinstance(frame, str) else bytes(frame).decode("utf-8", errors="replace")
+        self._queue.put(CapturedFrame(time.time(), direction, text))
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _open_file(self) -> IO[str]:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path = f"{self._prefix}{timestamp}.jsonl.gz"
+        _log.info("Recording socket capture to '%s'", path)
+
+        existing = sorted(glob.glob(f"{glob.escape(self._prefix)}*.jsonl.gz"))
+        for old_path in existing[: max(0, len(existing) - self._max_files + 1)]:
+            os.remove(old_path)
+        return gzip.open(path, "wt", encoding="utf-8")
+
+    def _write_loop(self) -> None:
+        capture_file: Optional[IO[str]] = None
+        written = 0
+        last_flush = time.monotonic()
+        try:
+            while (frame := self._queue.get()) is not None:
+                if capture_file is None or written >= self._max_bytes:
+                    if capture_file is not None:
+                        capture_file.close()
+                    capture_file = self._open_file()
+                    written = 0
+
+                line = json.dumps({"t": frame.time, "dir": frame.direction, "frame": frame.frame}) + "\n"
+                capture_file.write(line)
+                written += len(line)
+
+                # Flush once things go quiet (and at most once a second), so a crash loses little
+                if self._queue.empty() and time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                    capture_file.flush()
+                    last_flush = time.monotonic()
+        except Exception as ex:
+            _log.error("Socket capture stopped after a write failure: %s", ex)
+        finally:
+            if capture_file is not None:
+                capture_file.close()
+
+
+# Reads the frames of a capture file written by CaptureRecorder
+def read_capture(path: str) -> Iterator[CapturedFrame]:
+    with gzip.open(path, "rt", encoding="utf-8") as capture_file:
+        for line in capture_file:
+            if line.strip():
+                record = json.loads(line)
+                yield CapturedFrame(float(record["t"]), record["dir"], record["frame"])
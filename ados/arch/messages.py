@@ -1,10 +1,14 @@
+import functools
 import json
 import logging
+import time
+from array import array
 from typing import Any, Iterator
 
 from websockets.typing import Data
 
-from ados.common import ItemInfo, LocationInfo, SlotInfo
+from ados.common import DeathInfo, GameTable, ScoutInfo, SlotInfo
+from ados.metrics import DESERIALIZE_SECONDS, SOCKET_BYTES, SOCKET_FRAMES
 
 _log = logging.getLogger(__name__)
 
@@ -12,12 +16,24 @@ ARCH_VERSION = "0.6.5"
 ARCH_MAJOR, ARCH_MINOR, ARCH_BUILD = [int(part) for part in ARCH_VERSION.split(".")]
 
 
+# Every player is sent again in each RoomUpdate, though usually few (if any) have a new alias, so
+# the parsing is memoized on the raw values
+@functools.lru_cache(maxsize=4096)
+def _alias_from_data(name: str, alias: str) -> str:
+    return alias.replace(f"({name})", "").strip()
+
+
 def _slot_from_data(player: dict[str, Any], slots_info: dict[str, Any]) -> SlotInfo:
-    alias = player["alias"].replace(f"({player["name"]})", "").strip()
+    alias = _alias_from_data(player["name"], player["alias"])
     game = slots_info[str(player["slot"])]["game"]
     return SlotInfo(id=player["slot"], name=player["name"], alias=alias, game=game)
 
 
+def _death_from_data(data: dict[str, Any]) -> DeathInfo:
+    death_data = data["data"]
+    return DeathInfo(time=float(death_data["time"]), source=str(death_data["source"]), cause=death_data.get("cause"))
+
+
 ################################################
 ############### CLIENT MESSAGES ################
 ################################################
@@ -27,8 +43,9 @@ def serialize(message: dict[str, Any]) -> str:
     return json.dumps([message])
 
 
-# Sent to the server to initiate a connection after receiving the RoomInfo message
-def connect_message(*, game: str, slot: str) -> str:
+# Sent to the server to initiate a connection after receiving the RoomInfo message. Connections
+# which have no use for DeathLink leave out its tag, so that the server does not send them bounces.
+def connect_message(*, game: str, slot: str, death_link: bool = True) -> str:
     return serialize(
         {
             "cmd": "Connect",
@@ -38,7 +55,7 @@ def connect_message(*, game: str, slot: str) -> str:
             "uuid": "ArchipelaDOS",
             "version": {"major": ARCH_MAJOR, "minor": ARCH_MINOR, "build": ARCH_BUILD, "class": "Version"},
             "items_handling": 0b000,
-            "tags": ["TextOnly", "Tracker", "DeathLink"],
+            "tags": ["TextOnly", "Tracker", "DeathLink"] if death_link else ["TextOnly", "Tracker"],
             "slot_data": False,
         }
     )
@@ -54,6 +71,18 @@ def get_data_package_message(games: list[str]) -> str:
     )
 
 
+# Sent to the server to find out which items are at locations of the connected slot, without
+# checking the locations or creating hints for them
+def location_scouts_message(locations: list[int]) -> str:
+    return serialize(
+        {
+            "cmd": "LocationScouts",
+            "locations": locations,
+            "create_as_hint": 0,
+        }
+    )
+
+
 ################################################
 ############### SERVER MESSAGES ################
 ################################################
@@ -68,15 +97,12 @@ class RoomInfoMessage:
 # Sent by the server in response to a GetDataPackage message
 class DataPackageMessage:
     def __init__(self, data: dict[str, Any]) -> None:
-        self.game_items: dict[str, list[ItemInfo]] = {}
-        self.game_locations: dict[str, list[LocationInfo]] = {}
+        self.game_items: dict[str, GameTable] = {}
+        self.game_locations: dict[str, GameTable] = {}
         for game, game_data in data["data"]["games"].items():
-            self.game_items[game] = [
-                ItemInfo(id=id, name=name, game=game) for name, id in game_data["item_name_to_id"].items()
-            ]
-            self.game_locations[game] = [
-                LocationInfo(id=id, name=name, game=game) for name, id in game_data["location_name_to_id"].items()
-            ]
+            items, locations = game_data["item_name_to_id"], game_data["location_name_to_id"]
+            self.game_items[game] = GameTable(array("q", items.values()), list(items))
+            self.game_locations[game] = GameTable(array("q", locations.values()), list(locations))
 
 
 # Sent by the server in response to a Connect message if the connection is successful
@@ -84,6 +110,8 @@ class ConnectedMessage:
     def __init__(self, data: dict[str, Any]) -> None:
         self.slot_id = int(data["slot"])
         self.slots = [_slot_from_data(info, data["slot_info"]) for info in data["players"]]
+        # Every location of the connected slot, whether checked yet or not
+        self.locations = {int(location) for key in ("missing_locations", "checked_locations") for location in data[key]}
 
 
 # Sent by the server in response to a Connect message if the connection is unsuccessful
@@ -92,20 +120,71 @@ class ConnectionRefusedMessage:
         self.errors: list[str] = data.get("errors", [])
 
 
-# Sent by the server when the room information is updated -- particularly slot aliases
+# Sent by the server when the room information is updated -- particularly slot aliases. Only the
+# fields which changed are included, so there is no slot info to take games from.
 class RoomUpdateMessage:
     def __init__(self, data: dict[str, Any]) -> None:
-        self.slots = [_slot_from_data(info, data["slot_info"]) for info in data["players"]]
+        self.aliases: dict[int, str] = {
+            int(info["slot"]): _alias_from_data(info["name"], info["alias"]) for info in data["players"]
+        }
 
 
-# Sent by the server when one slot sends an item to another slot
+# Sent by the server when one slot sends an item to another slot (or to itself). Items which
+# were not found at a location (e.g. starting inventory) have a negative location ID.
+class ItemSendMessage:
+    def __init__(self, data: dict[str, Any]) -> None:
+        item = data["item"]
+        self.receiver_id = int(data["receiving"])
+        self.sender_id = int(item["player"])
+        self.item_id = int(item["item"])
+        self.location_id = int(item["location"])
+        self.flags = int(item["flags"])
 
 
-type ServerMessage = RoomInfoMessage | DataPackageMessage | ConnectedMessage | ConnectionRefusedMessage | RoomUpdateMessage
+# Sent by the server to relay DeathLink events. Every DeathLink bounce in a single frame is
+# combined into one message, so that a cascade of deaths is handled all at once.
+class DeathLinkMessage:
+    def __init__(self, deaths: list[DeathInfo]) -> None:
+        self.deaths = deaths
+
+
+# Sent by the server in response to a LocationScouts message, with the item at each location
+class LocationInfoMessage:
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.scouts = [
+            ScoutInfo(
+                location_id=int(item["location"]),
+                item_id=int(item["item"]),
+                receiver_id=int(item["player"]),
+                flags=int(item["flags"]),
+            )
+            for item in data["locations"]
+        ]
+
+
+type ServerMessage = (
+    RoomInfoMessage
+    | DataPackageMessage
+    | ConnectedMessage
+    | ConnectionRefusedMessage
+    | RoomUpdateMessage
+    | ItemSendMessage
+    | DeathLinkMessage
+    | LocationInfoMessage
+)
 
 
 def deserialize(raw_message: Data) -> Iterator[ServerMessage]:
-    for data in json.loads(raw_message):
+    start = time.perf_counter()
+    messages = json.loads(raw_message)
+    DESERIALIZE_SECONDS.observe(time.perf_counter() - start)
+
+    frame_cmd = str(messages[0].get("cmd")) if messages else "empty"
+    SOCKET_FRAMES.inc(frame_cmd)
+    SOCKET_BYTES.inc(frame_cmd, amount=len(raw_message))
+
+    deaths: list[DeathInfo] = []
+    for data in messages:
         try:
             cmd = data.get("cmd", None)
             if cmd is None:
@@ -122,6 +201,15 @@ def deserialize(raw_message: Data) -> Iterator[ServerMessage]:
                 yield ConnectionRefusedMessage(data)
             elif cmd == "RoomUpdate" and "players" in data:
                 yield RoomUpdateMessage(data)
+            elif cmd == "PrintJSON" and data.get("type") == "ItemSend":
+                yield ItemSendMessage(data)
+            elif cmd == "LocationInfo":
+                yield LocationInfoMessage(data)
+            elif cmd == "Bounced" and "DeathLink" in data.get("tags", []):
+                deaths.append(_death_from_data(data))
 
         except Exception as ex:
             _log.error("Failed to deserialize server message: %s - %s", ex, data)
+
+    if deaths:
+        yield DeathLinkMessage(deaths)
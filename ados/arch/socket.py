@@ -1,13 +1,20 @@
 import asyncio
 import logging
+import time
 from collections import defaultdict
 from typing import Any, Awaitable, Callable, Optional
 
 from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosedError, ConnectionClosedOK
+from websockets.frames import CloseCode
+from websockets.typing import Data
 
+from ados.arch.capture import CaptureRecorder, read_capture
 from ados.arch.messages import *  # pylint: disable = unused-wildcard-import, wildcard-import
 from ados.common import ADOSError
 from ados.config import ADOSConfig
+from ados.logger import Truncated
+from ados.metrics import HANDLER_SECONDS, RECENT_TIMINGS
 
 _log = logging.getLogger(__name__)
 
@@ -17,29 +24,64 @@ _log = logging.getLogger(__name__)
 # handlers for specific message types.
 class SocketClient:
 
-    def __init__(self, config: ADOSConfig, *, slot_name: str, game: str, fetch_data: bool):
+    def __init__(self, config: ADOSConfig, *, slot_name: str, game: str, fetch_data: bool, death_link: bool = True):
         self._config = config
         self._game = game
         self._slot_name = slot_name
         self._fetch_data = fetch_data
+        self._death_link = death_link
 
         self._handlers: dict[type[ServerMessage], list[Callable[[Any], Awaitable[None]]]] = defaultdict(list)
 
         self._socket: Optional[ClientConnection] = None
         self._socket_task: Optional[asyncio.Task[None]] = None
         self._server_url: Optional[str] = None
+        self._capture: Optional[CaptureRecorder] = None
+        self._connect_lock = asyncio.Lock()  # Connecting again (e.g. on refresh) waits for any connect in progress
 
     async def connect(self, server_url: str) -> None:
+        async with self._connect_lock:
+            if self._config.socket_capture and self._capture is None:
+                self._capture = CaptureRecorder(self._config, self._slot_name)
+
+            if self._socket is not None:
+                assert self._socket_task is not None
+                _log.info("Closing existing socket connection to '%s' for slot '%s'", self._server_url, self._slot_name)
+                await self._socket.close()
+                await asyncio.gather(self._socket_task, return_exceptions=True)
+                self._socket = None
+                self._socket_task = None
+
+            self._socket = await self._initialize_connection(server_url)
+            self._socket_task = asyncio.create_task(self._socket_loop())
+            self._server_url = server_url
+        _log.info("Established socket connection to '%s' for slot '%s'", self._server_url, self._slot_name)
+
+    async def close(self) -> None:
         if self._socket is not None:
             assert self._socket_task is not None
-            _log.info("Closing existing socket connection to '%s' for slot '%s'", self._server_url, self._slot_name)
+            _log.info("Closing socket connection to '%s' for slot '%s'", self._server_url, self._slot_name)
             await self._socket.close()
-            await self._socket_task
-
-        self._socket = await self._initialize_connection(server_url)
-        self._socket_task = asyncio.create_task(self._socket_loop())
-        self._server_url = server_url
-        _log.info("Established socket connection to '%s' for slot '%s'", self._server_url, self._slot_name)
+            await asyncio.gather(self._socket_task, return_exceptions=True)
+            self._socket = None
+            self._socket_task = None
+
+    # URL of the server last connected to, if any
+    @property
+    def server_url(self) -> Optional[str]:
+        return self._server_url
+
+    # Whether the connection is up, i.e. it has been established and not closed by either side
+    @property
+    def connected(self) -> bool:
+        return self._socket_task is not None and not self._socket_task.done()
+
+    # Sends a client message (built by one of the functions in ados.arch.messages) over the
+    # established connection
+    async def send(self, frame: str) -> None:
+        if self._socket is None or not self.connected:
+            raise ADOSError(f"Not connected to the Archipelago server for slot '{self._slot_name}'")
+        await self._send(self._socket, frame)
 
     # Allows other classes to handle incoming messages. The first argument is the type
     # of message to handle, and the second is the async function to be called when that
@@ -51,32 +93,100 @@ class SocketClient:
     ) -> None:
         self._handlers[message_type].append(handler)
 
-    async def _initialize_connection(self, server_url: str) -> ClientConnection:
+    # Feeds the frames received in a capture file back through the same processing as live
+    # frames, without any network connection. Frames are replayed at their recorded pace scaled
+    # by 'speed', or as fast as possible if speed is None (yielding to the event loop between
+    # frames either way). Returns the number of frames replayed.
+    async def replay(self, capture_path: str, *, speed: Optional[float] = None) -> int:
+        frame_count = 0
+        replay_start = time.perf_counter()
+        capture_start: Optional[float] = None
+        for captured in read_capture(capture_path):
+            if captured.direction != "in":
+                continue
+            if capture_start is None:
+                capture_start = captured.time
+            if speed:
+                delay = replay_start + (captured.time - capture_start) / speed - time.perf_counter()
+                await asyncio.sleep(max(0.0, delay))
+            else:
+                # Frames from a live socket arrive through the event loop, so other tasks get to
+                # run between them; replaying as fast as possible should not starve them either
+                await asyncio.sleep(0)
+            await self._process_frame(captured.frame)
+            frame_count += 1
+        return frame_count
+
+    async def _recv(self, socket: ClientConnection) -> Data:
+        try:
+            # Received as bytes: JSON is decoded straight from UTF-8, so text frames are never
+            # decoded to a separate string
+            frame = await socket.recv(decode=False)
+        except ConnectionClosedError as ex:
+            if ex.sent is not None and ex.sent.code == CloseCode.MESSAGE_TOO_BIG:
+                raise _MessageTooBigError(
+                    f"Server message for slot '{self._slot_name}' exceeded the limit of "
+                    f"{self._config.socket_max_message_bytes} bytes (socket_max_message_bytes)"
+                ) from ex
+            raise
+        if self._capture is not None:
+            self._capture.record("in", frame)
+        return frame
+
+    async def _send(self, socket: ClientConnection, frame: str) -> None:
+        if self._capture is not None:
+            self._capture.record("out", frame)
+        await socket.send(frame)
+
+    async def _initialize_connection(self, server_url: str, per_game: Optional[bool] = None) -> ClientConnection:
         # The Archipelago handshake consists of:
         #   - Server sends "RoomInfo" message on socket establishment
         #   - Client sends optional "GetDataPackage" message (if fetch_data is True)
         #   - Server responds with "DataPackage" message (if requested)
         #   - Client sends "Connect" message
         #   - Server responds with either "Connected" or "ConnectionRefused" message
-        socket = await connect(server_url, max_size=None)
-        server_msgs = list(deserialize(await socket.recv()))
+        socket = await connect(server_url, max_size=self._config.socket_max_message_bytes)
+        server_msgs = list(deserialize(await self._recv(socket)))
         if len(server_msgs) != 1 or not isinstance(server_msgs[0], RoomInfoMessage):
             raise ADOSError("Received invalid room info message from websocket server")
         await self._handle_message(server_msgs[0])
 
         if self._fetch_data:
-            _log.info("Requesting data package from server at '%s' for slot '%s'", server_url, self._slot_name)
-            await socket.send(get_data_package_message(server_msgs[0].games))
-
-            server_msgs = list(deserialize(await socket.recv()))
-            if len(server_msgs) != 1 or not isinstance(server_msgs[0], DataPackageMessage):
-                raise ADOSError("Received invalid data package message from websocket server")
-            await self._handle_message(server_msgs[0])
+            # Requesting one game at a time bounds each message (and everything parsed from it) by
+            # the size of the largest game, rather than that of the whole multiworld
+            games = server_msgs[0].games
+            if per_game is None:
+                per_game = self._config.socket_data_package_per_game
+            _log.info(
+                "Requesting data package from server at '%s' for slot '%s'%s",
+                server_url,
+                self._slot_name,
+                f" ({len(games)} games, one at a time)" if per_game else "",
+            )
+            for request_games in [[game] for game in games] if per_game else [games]:
+                await self._send(socket, get_data_package_message(request_games))
+
+                try:
+                    frame = await self._recv(socket)
+                except _MessageTooBigError:
+                    # The server closes the connection after a message that is too big, so start
+                    # over, this time asking for games one at a time
+                    if per_game or len(games) < 2:
+                        raise
+                    _log.warning(
+                        "Data package for slot '%s' exceeded socket_max_message_bytes, retrying one game at a time",
+                        self._slot_name,
+                    )
+                    return await self._initialize_connection(server_url, per_game=True)
+                server_msgs = list(deserialize(frame))
+                if len(server_msgs) != 1 or not isinstance(server_msgs[0], DataPackageMessage):
+                    raise ADOSError("Received invalid data package message from websocket server")
+                await self._handle_message(server_msgs[0])
 
         _log.info("Sending connect message to server at '%s' for slot '%s'", server_url, self._slot_name)
-        await socket.send(connect_message(game=self._game, slot=self._slot_name))
+        await self._send(socket, connect_message(game=self._game, slot=self._slot_name, death_link=self._death_link))
 
-        server_msgs = list(deserialize(await socket.recv()))
+        server_msgs = list(deserialize(await self._recv(socket)))
         if len(server_msgs) != 1 or not isinstance(server_msgs[0], (ConnectedMessage, ConnectionRefusedMessage)):
             raise ADOSError("Received invalid connection response from websocket server")
         if not isinstance(server_msgs[0], ConnectedMessage):
@@ -88,11 +198,27 @@ class SocketClient:
 
     async def _socket_loop(self) -> None:
         assert self._socket is not None
-        async for socket_message in self._socket:
-            _log.warning("Received socket message for slot '%s': %s", self._slot_name, str(socket_message))
-            for message in deserialize(socket_message):
-                await self._handle_message(message)
+        try:
+            while True:
+                await self._process_frame(await self._recv(self._socket))
+        except ConnectionClosedOK:
+            pass
+
+    async def _process_frame(self, socket_message: Data) -> None:
+        _log.debug("Received socket message for slot '%s': %s", self._slot_name, Truncated(socket_message))
+        for message in deserialize(socket_message):
+            await self._handle_message(message)
 
     async def _handle_message(self, message: ServerMessage) -> None:
+        message_name = type(message).__name__
         for handler in self._handlers[type(message)]:
+            start = time.perf_counter()
             await handler(message)
+            elapsed = time.perf_counter() - start
+            HANDLER_SECONDS.observe(elapsed, message_name, handler.__qualname__)
+            RECENT_TIMINGS.record("handler", f"{handler.__qualname__}({message_name})", elapsed)
+
+
+# Raised when the server sends a message larger than socket_max_message_bytes
+class _MessageTooBigError(ADOSError):
+    pass
@@ -29,17 +29,18 @@ class WebClient:
     def room_url(self) -> str:
         return self._room_url
 
+    # Unset until the first successful refresh
     @property
-    def tracker_url(self) -> str:
-        assert self._tracker_url is not None
+    def tracker_url(self) -> Optional[str]:
         return self._tracker_url
 
+    # Unset until the first successful refresh
     @property
-    def server_url(self) -> str:
-        assert self._server_url is not None
+    def server_url(self) -> Optional[str]:
         return self._server_url
 
-    async def refresh(self) -> None:
+    # Fetches the room page again, and returns the URL of the websocket server
+    async def refresh(self) -> str:
 
         _log.info("Refreshing web information from '%s'", self.room_url)
 
@@ -55,6 +56,7 @@ class WebClient:
                 raise ADOSError(f"Failed to parse URL information at '{self.room_url}'")
 
             self._tracker_url = f"https://{BASE_URL}/tracker/{tracker_match.group(1)}"
-            self._server_url = f"wss://{BASE_URL}:{port_match.group(1)}"
+            server_url = self._server_url = f"wss://{BASE_URL}:{port_match.group(1)}"
 
-        _log.info("Completed web information refresh; server is running at '%s'", self.server_url)
+        _log.info("Completed web information refresh; server is running at '%s'", server_url)
+        return server_url
@@ -0,0 +1,280 @@
+import asyncio
+import copy
+import logging
+import multiprocessing
+import threading
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, Optional
+
+from ados.arch.messages import ServerMessage
+from ados.arch.socket import SocketClient
+from ados.common import ADOSError
+from ados.config import ADOSConfig
+
+_log = logging.getLogger(__name__)
+
+# Messages passed over the pipe are (kind, payload) tuples, pickled by multiprocessing. Parsed
+# server messages are plain objects of small tuples, so they are far smaller than the JSON frames
+# they were built from; the data package in particular is kept as columns of IDs and names (see
+# GameTable), which unpickle in a small fraction of the time needed to parse the JSON.
+#   - Parent to worker: ("connect", server_url), ("send", frame), ("close", None)
+#   - Worker to parent: ("message", ServerMessage), ("log", LogRecord), ("connected", None), ("error", str),
+#     ("disconnected", None)
+type PipeMessage = tuple[str, Any]
+
+WORKER_RESTART_DELAY = 5.0
+WORKER_STOP_TIMEOUT = 5.0
+
+
+# Reads from the pipe on a daemon thread, so that a blocked read never holds up interpreter exit,
+# and hands each message to the event loop through a queue. None is queued once the pipe closes.
+def _start_pipe_reader(connection: Connection, name: str) -> asyncio.Queue[Optional[PipeMessage]]:
+    loop = asyncio.get_running_loop()
+    pipe_queue: asyncio.Queue[Optional[PipeMessage]] = asyncio.Queue()
+
+    def _read() -> None:
+        while True:
+            try:
+                item: Optional[PipeMessage] = connection.recv()
+            except (EOFError, OSError):
+                item = None
+            try:
+                loop.call_soon_threadsafe(pipe_queue.put_nowait, item)
+            except RuntimeError:
+                return  # Event loop has already been closed
+            if item is None:
+                return
+
+    threading.Thread(target=_read, name=name, daemon=True).start()
+    return pipe_queue
+
+
+# Forwards log records from the worker to the parent process, which passes them to its own
+# handlers. This way the worker never opens (and possibly truncates) the log file itself.
+class _PipeLogHandler(logging.Handler):
+
+    def __init__(self, connection: Connection):
+        super().__init__()
+        self._connection = connection
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            # Same preparation as logging.handlers.QueueHandler, so the record can be pickled
+            message = self.format(record)
+            record = copy.copy(record)
+            record.message = message
+            record.msg = message
+            record.args = None
+            record.exc_info = None
+            record.exc_text = None
+            record.stack_info = None
+            self._connection.send(("log", record))
+        except Exception:
+            self.handleError(record)
+
+
+# A SocketClient whose connection lives in a child process. The worker owns the websocket,
+# decodes the JSON frames, and builds the server message objects; the parent only receives
+# the parsed messages and runs its registered handlers on them. CPU spikes from large frames
+# therefore never block the event loop that the Discord client runs on.
+# The handlers (i.e. ADOSState ingestion) deliberately stay in the parent: commands read the state
+# synchronously, and moving it would turn every lookup into a round trip over the pipe. The only
+# expensive message to ingest is the data package, and with its tables kept as columns, a 16 game
+# data package (320,000 entries) takes about 25 ms to unpickle and store, against about 200 ms to
+# parse in the worker (and about 500 ms to unpickle as one tuple per entry, as it was sent before).
+# Lookups are then built one game at a time, on first use (about 18 ms for a 20,000 entry game).
+# A message whose handler fails is logged and skipped. If the worker process dies, that is logged,
+# and the worker is restarted and reconnected to the last server until that succeeds (or the client
+# is closed).
+class WorkerSocketClient(SocketClient):
+
+    def __init__(self, config: ADOSConfig, *, slot_name: str, game: str, fetch_data: bool):
+        super().__init__(config, slot_name=slot_name, game=game, fetch_data=fetch_data)
+
+        self._process: Optional[BaseProcess] = None
+        self._connection: Optional[Connection] = None
+        self._reader_task: Optional[asyncio.Task[None]] = None
+        self._restart_task: Optional[asyncio.Task[None]] = None
+
+        self._connect_result: Optional[asyncio.Future[None]] = None
+        self._worker_connected = False
+
+    async def connect(self, server_url: str) -> None:
+        async with self._connect_lock:
+            if self._process is None:
+                self._start_worker()
+            assert self._connection is not None
+
+            self._worker_connected = False
+            self._connect_result = asyncio.get_running_loop().create_future()
+            self._connection.send(("connect", server_url))
+            await self._connect_result
+            self._worker_connected = True
+            self._server_url = server_url
+
+        _log.info("Established worker socket connection to '%s' for slot '%s'", self._server_url, self._slot_name)
+
+    # Closes the connection, and stops the worker process (killing it if it does not exit in time)
+    async def close(self) -> None:
+        if self._restart_task is not None:
+            self._restart_task.cancel()
+            self._restart_task = None
+        process, connection, reader_task = self._process, self._connection, self._reader_task
+        self._process = self._connection = self._reader_task = None
+        self._worker_connected = False
+        if process is None or connection is None:
+            return
+
+        _log.info("Stopping socket worker process %d for slot '%s'", process.pid, self._slot_name)
+        if reader_task is not None:
+            reader_task.cancel()
+        try:
+            connection.send(("close", None))
+        except OSError:
+            pass  # Already gone
+        await asyncio.to_thread(process.join, WORKER_STOP_TIMEOUT)
+        if process.is_alive():
+            _log.warning("Socket worker process %d did not exit; killing it", process.pid)
+            process.kill()
+            await asyncio.to_thread(process.join)
+        connection.close()
+        self._finish_connect(ADOSError("Socket worker process was stopped"))
+
+    @property
+    def connected(self) -> bool:
+        return self._worker_connected
+
+    async def send(self, frame: str) -> None:
+        if self._connection is None or not self._worker_connected:
+            raise ADOSError(f"Not connected to the Archipelago server for slot '{self._slot_name}'")
+        self._connection.send(("send", frame))
+
+    def _start_worker(self) -> None:
+        # The worker has no use for the Discord token, so it is not sent to the child process
+        worker_config = self._config.model_copy(update={"discord_token": ""})
+
+        context = multiprocessing.get_context("spawn")
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(
+            target=run_worker,
+            args=(worker_config, child_connection, self._slot_name, self._game, self._fetch_data),
+            name=f"ados-socket-{self._slot_name}",
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+        self._reader_task = asyncio.create_task(self._worker_loop())
+        _log.info("Started socket worker process %d for slot '%s'", self._process.pid, self._slot_name)
+
+    async def _worker_loop(self) -> None:
+        assert self._connection is not None
+        pipe_queue = _start_pipe_reader(self._connection, f"ados-worker-reader-{self._slot_name}")
+        try:
+            while True:
+                item = await pipe_queue.get()
+                if item is None:
+                    raise ADOSError("Socket worker process exited unexpectedly")
+
+                kind, payload = item
+                if kind == "message":
+                    try:
+                        await self._handle_message(payload)
+                    except Exception:
+                        _log.exception("Failed to handle %s for slot '%s'", type(payload).__name__, self._slot_name)
+                elif kind == "log":
+                    logging.getLogger(payload.name).handle(payload)
+                elif kind == "connected":
+                    self._finish_connect(None)
+                elif kind == "error":
+                    self._finish_connect(ADOSError(payload))
+                elif kind == "disconnected":
+                    self._worker_connected = False
+        except Exception as ex:
+            _log.error(
+                "Socket worker for slot '%s' failed: %s", self._slot_name, ex, exc_info=not isinstance(ex, ADOSError)
+            )
+            self._finish_connect(ADOSError(f"Socket worker failed: {ex}"))
+            self._reader_task = None  # Not to be cancelled by close(), since this is that task
+            await self.close()
+            if self._server_url is not None:
+                self._restart_task = asyncio.create_task(self._restart(self._server_url))
+
+    # Starts a new worker and reconnects it to the given server, retrying until that succeeds
+    async def _restart(self, server_url: str) -> None:
+        while True:
+            await asyncio.sleep(WORKER_RESTART_DELAY)
+            _log.info("Restarting socket worker for slot '%s'", self._slot_name)
+            try:
+                await self.connect(server_url)
+                return
+            except Exception as ex:
+                _log.error("Failed to restart socket worker for slot '%s': %s", self._slot_name, ex)
+
+    def _finish_connect(self, error: Optional[Exception]) -> None:
+        if self._connect_result is None or self._connect_result.done():
+            return
+        if error is None:
+            self._connect_result.set_result(None)
+        else:
+            self._connect_result.set_exception(error)
+
+
+################################################
+############### WORKER PROCESS #################
+################################################
+
+
+# Entry point of the worker process; must be a module-level function so it can be spawned
+def run_worker(config: ADOSConfig, connection: Connection, slot_name: str, game: str, fetch_data: bool) -> None:
+    root_log = logging.getLogger()
+    root_log.addHandler(_PipeLogHandler(connection))
+    root_log.setLevel(config.logging_level)
+    try:
+        asyncio.run(_run_worker(config, connection, slot_name, game, fetch_data))
+    except KeyboardInterrupt:
+        pass
+
+
+# Runs inside the worker process; instead of handling messages itself, every parsed server
+# message is sent back to the parent process to be handled there
+class _ForwardingSocketClient(SocketClient):
+
+    def __init__(self, config: ADOSConfig, connection: Connection, *, slot_name: str, game: str, fetch_data: bool):
+        super().__init__(config, slot_name=slot_name, game=game, fetch_data=fetch_data)
+        self._connection = connection
+
+    async def _handle_message(self, message: ServerMessage) -> None:
+        self._connection.send(("message", message))
+
+    # Tells the parent when the connection ends, either way
+    async def _socket_loop(self) -> None:
+        try:
+            await super()._socket_loop()
+        finally:
+            self._connection.send(("disconnected", None))
+
+
+async def _run_worker(config: ADOSConfig, connection: Connection, slot_name: str, game: str, fetch_data: bool) -> None:
+    socket = _ForwardingSocketClient(config, connection, slot_name=slot_name, game=game, fetch_data=fetch_data)
+    pipe_queue = _start_pipe_reader(connection, "ados-worker-commands")
+    while True:
+        item = await pipe_queue.get()
+        if item is None:
+            return  # The parent process has gone away, so there is no one left to serve
+
+        command, payload = item
+        if command == "connect":
+            try:
+                await socket.connect(payload)
+                connection.send(("connected", None))
+            except Exception as ex:
+                connection.send(("error", str(ex)))
+        elif command == "send":
+            try:
+                await socket.send(payload)
+            except Exception as ex:
+                _log.error("Failed to send message for slot '%s': %s", slot_name, ex)
+        elif command == "close":
+            await socket.close()
+            return
@@ -0,0 +1,118 @@
+import asyncio
+import io
+import logging
+import time
+from collections.abc import Hashable
+from concurrent.futures import BrokenExecutor, Executor
+from datetime import datetime
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from ados.common import ADOSError
+from ados.config import ADOSConfig
+from ados.metrics import CHART_RENDER_SECONDS, CHART_REQUESTS
+from ados.timeseries import TimeSeries
+
+_log = logging.getLogger(__name__)
+
+
+# Data for a chart of cumulative event counts over time (e.g. checks or deaths), with one line
+# per series. Charts are pickled to the rendering processes, so they only hold plain data.
+class TimelineChart(NamedTuple):
+    title: str
+    ylabel: str
+    series: dict[str, TimeSeries]  # Maps series labels to (time, cumulative count) points
+
+
+# Renders a timeline chart to PNG. Runs in a rendering process, so matplotlib is only ever
+# imported there.
+def render_timeline(chart: TimelineChart) -> bytes:
+    # pylint: disable = import-outside-toplevel
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from matplotlib import dates, pyplot
+
+    figure, axes = pyplot.subplots(figsize=(10, 6), dpi=100)
+    try:
+        for label, points in sorted(chart.series.items()):
+            if not points:
+                continue
+            times = dates.date2num([datetime.fromtimestamp(point_time) for point_time, _ in points])  # type: ignore[no-untyped-call]
+            axes.step(times, [count for _, count in points], where="post", label=label)
+        axes.xaxis_date()
+        axes.set_title(chart.title)
+        axes.set_ylabel(chart.ylabel)
+        axes.grid(True, alpha=0.3)
+        if axes.has_data():
+            axes.legend(loc="upper left", fontsize="small", ncol=max(1, len(chart.series) // 16))
+        figure.autofmt_xdate()
+
+        image = io.BytesIO()
+        figure.savefig(image, format="png")
+        return image.getvalue()
+    finally:
+        pyplot.close(figure)
+
+
+class _CachedChart(NamedTuple):
+    version: Hashable
+    image: bytes
+
+
+# Renders charts in a pool of worker processes, so that matplotlib never blocks the event loop.
+# Rendered images are cached by key along with the version of the data they were built from,
+# and only rendered again once that version changes. Concurrent requests for a chart which is
+# already being rendered wait for that render rather than starting another. The pool (and the
+# multiprocessing machinery behind it) is only loaded and started on the first render.
+class ChartRenderer:
+
+    def __init__(self, config: ADOSConfig):
+        self._processes = config.chart_processes
+        self._pool: Optional[Executor] = None
+        self._cache: dict[Hashable, _CachedChart] = {}
+        self._pending: dict[tuple[Hashable, Hashable], asyncio.Future[bytes]] = {}
+
+    # The chart data is only built (by awaiting 'build') when the chart actually has to be rendered
+    async def render(self, key: Hashable, version: Hashable, build: Callable[[], Awaitable[TimelineChart]]) -> bytes:
+        cached = self._cache.get(key)
+        if cached is not None and cached.version == version:
+            CHART_REQUESTS.inc("hit")
+            return cached.image
+
+        pending = self._pending.get((key, version))
+        if pending is not None:
+            CHART_REQUESTS.inc("shared")
+            return await asyncio.shield(pending)
+
+        CHART_REQUESTS.inc("render")
+        future = asyncio.ensure_future(self._render(key, version, build))
+        self._pending[(key, version)] = future
+        return await asyncio.shield(future)
+
+    async def _render(self, key: Hashable, version: Hashable, build: Callable[[], Awaitable[TimelineChart]]) -> bytes:
+        if self._pool is None:
+            # pylint: disable = import-outside-toplevel
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            _log.info("Starting %d chart rendering process(es)", self._processes)
+            self._pool = ProcessPoolExecutor(self._processes, mp_context=multiprocessing.get_context("spawn"))
+
+        start = time.perf_counter()
+        try:
+            chart = await build()
+            image = await asyncio.get_running_loop().run_in_executor(self._pool, render_timeline, chart)
+        except BrokenExecutor as ex:
+            _log.error("Chart rendering process exited unexpectedly; restarting on the next render")
+            self._pool = None
+            raise ADOSError("Failed to render the chart; try again later") from ex
+        finally:
+            self._pending.pop((key, version), None)
+        CHART_RENDER_SECONDS.observe(time.perf_counter() - start)
+        self._cache[key] = _CachedChart(version, image)
+        return image
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,4 +1,5 @@
-from typing import NamedTuple
+from enum import IntFlag
+from typing import NamedTuple, Optional, Self, Sequence
 
 
 # Thrown to send a particular error message to the user through Discord.
@@ -20,6 +21,34 @@ class SlotInfo(NamedTuple):
         return f"{self.alias} ({self.name})"
 
 
+# Classification of an item by importance. The progression, useful, and trap bits are the same
+# as in Archipelago's item flags; filler items have none of those set, so get a bit of their own.
+# A combination of levels is used as a filter, matching items with any of its levels.
+class ItemLevel(IntFlag):
+    PROGRESSION = 0b0001
+    USEFUL = 0b0010
+    TRAP = 0b0100
+    FILLER = 0b1000
+
+    @classmethod
+    def from_flags(cls, flags: int) -> Self:
+        return cls(flags & 0b0111) or cls.FILLER
+
+    # Parses a filter given by a user, as a comma-separated list of levels
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Self:
+        if value is None:
+            return ~cls(0)
+        levels = cls(0)
+        for name in value.split(","):
+            try:
+                levels |= cls[name.strip().upper()]
+            except KeyError as ex:
+                options = ", ".join(f"`{level.name.lower()}`" for level in cls)  # type: ignore[union-attr]
+                raise ADOSError(f"Unknown item level '{name.strip()}' (must be one of {options})") from ex
+        return levels
+
+
 # Stores information about a particular item in the multiworld.
 class ItemInfo(NamedTuple):
     id: int
@@ -30,6 +59,14 @@ class ItemInfo(NamedTuple):
         return self.name
 
 
+# All items (or locations) of one game, as parallel columns of IDs and names. Data packages are
+# kept in this form: it is far cheaper to build, pickle, and store than a tuple per entry, and
+# entries are only created for the games they are looked up in.
+class GameTable(NamedTuple):
+    ids: Sequence[int]
+    names: list[str]
+
+
 # Stores information about a particular location in the multiworld.
 class LocationInfo(NamedTuple):
     id: int
@@ -38,3 +75,20 @@ class LocationInfo(NamedTuple):
 
     def __str__(self) -> str:
         return self.name
+
+
+# Stores information about a single DeathLink event. The source is the name of the slot whose
+# death triggered it.
+class DeathInfo(NamedTuple):
+    time: float
+    source: str
+    cause: Optional[str]
+
+
+# Stores the item placed at a particular location, as found by scouting the location. The
+# receiver is the slot the item will be sent to once the location is checked.
+class ScoutInfo(NamedTuple):
+    location_id: int
+    item_id: int
+    receiver_id: int
+    flags: int
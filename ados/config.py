@@ -1,7 +1,7 @@
 import os
 from enum import Enum
 from logging import getLevelName, getLevelNamesMapping
-from typing import Annotated, Any, Optional, Self
+from typing import Annotated, Any, Literal, Optional, Self
 
 import yaml
 from pydantic import (
@@ -26,6 +26,32 @@ class LoggingBehavior(str, Enum):
     FILE_OVERWRITE = "file_overwrite"
     FILE_APPEND = "file_append"
     FILE_DIRECTORY = "file_directory"
+    FILE_ROTATE_SIZE = "file_rotate_size"
+    FILE_ROTATE_TIME = "file_rotate_time"
+
+    # Whether logging_path refers to a directory holding room-specific log files
+    @property
+    def uses_directory(self) -> bool:
+        return self in (
+            LoggingBehavior.FILE_DIRECTORY,
+            LoggingBehavior.FILE_ROTATE_SIZE,
+            LoggingBehavior.FILE_ROTATE_TIME,
+        )
+
+
+class LoggingFormat(str, Enum):
+    TEXT = "text"
+    JSON = "json"
+
+
+class SocketMode(str, Enum):
+    IN_PROCESS = "in_process"
+    WORKER_PROCESS = "worker_process"
+
+
+class DiscordCacheProfile(str, Enum):
+    DEFAULT = "default"
+    MINIMAL = "minimal"
 
 
 # The main configuration class for ArchipelaDOS. Loaded from a YAML file on startup with strict
@@ -46,6 +72,35 @@ class ADOSConfig(BaseModel):
     logging_path: Optional[str]
     logging_level: Annotated[int, BeforeValidator(_transform_logging_level)]
     logging_color: bool
+    logging_format: LoggingFormat = LoggingFormat.TEXT
+    logging_threaded: bool = False
+    logging_max_message_length: Optional[int] = Field(default=4096, gt=0)
+    logging_rotate_bytes: int = Field(default=10 * 1024 * 1024, gt=0)
+    logging_rotate_when: Literal["S", "M", "H", "D", "midnight", "W0", "W1", "W2", "W3", "W4", "W5", "W6"] = "midnight"
+    logging_rotate_backups: int = Field(default=7, ge=0)
+
+    discord_cache_profile: DiscordCacheProfile = DiscordCacheProfile.DEFAULT
+
+    socket_mode: SocketMode = SocketMode.IN_PROCESS
+    socket_max_message_bytes: Optional[int] = Field(default=256 * 1024 * 1024, gt=0)
+    socket_data_package_per_game: bool = False
+    socket_capture: bool = False
+    socket_capture_max_bytes: int = Field(default=64 * 1024 * 1024, gt=0)
+    socket_capture_max_files: int = Field(default=10, gt=0)
+
+    snapshot_interval: Optional[int] = Field(default=300, gt=0)
+
+    scout_slot_connections: bool = False
+
+    timeseries_raw_hours: int = Field(default=48, gt=0)
+    timeseries_hourly_days: int = Field(default=30, gt=0)
+
+    chart_processes: int = Field(default=1, gt=0)
+
+    metrics_host: str = "127.0.0.1"
+    metrics_port: Optional[int] = None
+
+    diagnostics_enabled: bool = False
 
     # Serializes the int logging level to a string when dumping to JSON or other formats
     @field_serializer("logging_level")
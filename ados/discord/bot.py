@@ -1,10 +1,13 @@
+import asyncio
 import logging
-from typing import Optional
+import time
+from typing import Any, Optional
 
 import discord
 from discord.ext import commands
 from discord.ext.commands.context import Context
 from discord.ext.commands.errors import (
+    CheckFailure,
     CommandError,
     CommandInvokeError,
     CommandNotFound,
@@ -14,27 +17,78 @@ from discord.ext.commands.errors import (
 
 from ados.arch.socket import SocketClient
 from ados.arch.web import WebClient
+from ados.charts import ChartRenderer
 from ados.common import ADOSError
-from ados.config import ADOSConfig
+from ados.config import ADOSConfig, DiscordCacheProfile, SocketMode
 from ados.discord.commands import Commands
-from ados.discord.help import HelpCommand
-from ados.discord.utils import COMMAND_PREFIX, THREAD_NAME, send_failure
+from ados.discord.help import HelpCommand, HelpPages
+from ados.discord.utils import COMMAND_PREFIX, PAGED_THREADS, THREAD_NAME, send_failure
+from ados.metrics import (
+    COMMAND_SECONDS,
+    DISCORD_RATE_LIMITS,
+    RECENT_TIMINGS,
+    MetricsServer,
+)
 from ados.state import ADOSState
 
 type BotContext = Context[commands.Bot]
 
 _log = logging.getLogger(__name__)
 
+CONNECT_RETRY_MIN = 5.0
+CONNECT_RETRY_MAX = 300.0
+
+
+# py-cord retries rate limited requests internally, and only reports them through a warning on
+# its HTTP logger, so they are counted from there. The logger is lowered to at least WARNING so
+# the warnings always reach this filter, which then drops anything the root level would not log.
+class _RateLimitFilter(logging.Filter):
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno == logging.WARNING and str(record.msg).startswith("We are being rate limited"):
+            DISCORD_RATE_LIMITS.inc()
+        return record.levelno >= logging.getLogger().getEffectiveLevel()
+
+    # The logger is global, so the filter is only added once however many bots are created
+    @staticmethod
+    def install() -> None:
+        http_log = logging.getLogger("discord.http")
+        http_log.setLevel(min(http_log.getEffectiveLevel(), logging.WARNING))
+        if not any(isinstance(log_filter, _RateLimitFilter) for log_filter in http_log.filters):
+            http_log.addFilter(_RateLimitFilter())
+
+
+# Discord client options for a cache profile. The bot only ever reads guild and channel (and
+# thread) details, and the messages passed to on_message, so the minimal profile subscribes to
+# nothing else and caches no members, users, or past messages.
+def _client_options(profile: DiscordCacheProfile) -> dict[str, Any]:
+    if profile == DiscordCacheProfile.MINIMAL:
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+        intents.dm_messages = True
+        intents.message_content = True
+        return {
+            "intents": intents,
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "max_messages": None,
+            "chunk_guilds_at_startup": False,
+        }
+
+    intents = discord.Intents.default()
+    intents.message_content = True
+    return {"intents": intents}
+
 
 # The main ArchipelaDOS Discord bot class. Handles processing of user commands, sending
 # messages based on Archipelago events, and storage of bot state.
 class ADOSBot(commands.Bot):
 
     def __init__(self, config: ADOSConfig):
-        intents = discord.Intents.default()
-        intents.message_content = True
-        help_command = HelpCommand()  # type: ignore[no-untyped-call]
-        super().__init__(command_prefix=COMMAND_PREFIX, intents=intents, help_command=help_command)
+        self._help_pages = HelpPages()
+        help_command = HelpCommand(pages=self._help_pages)
+        client_options = _client_options(config.discord_cache_profile)
+        super().__init__(command_prefix=COMMAND_PREFIX, help_command=help_command, **client_options)
 
         # Guild and channel IDs start unset, and are populated in on_ready()
         self._guild_id: Optional[int] = None
@@ -42,19 +96,71 @@ class ADOSBot(commands.Bot):
         self._config = config
 
         self._web = WebClient(config)
-        self._socket = SocketClient(config, slot_name=config.archipelago_slot, game="Archipelago", fetch_data=True)
+        self._socket = self._create_socket(config)
         self._state = ADOSState(config, self._socket)
+        self._metrics = MetricsServer(config)
+        self._charts = ChartRenderer(config)
+        _RateLimitFilter.install()
 
-        bot_commands = Commands(self._state, self._web, self._socket)
+        bot_commands = Commands(self._state, self._web, self._socket, self._charts)
         self.add_cog(bot_commands)
+        if config.diagnostics_enabled:
+            # Profiling and tracing support is only loaded when diagnostics are enabled
+            # pylint: disable = import-outside-toplevel
+            from ados.discord.diagnostics import DiagnosticsCommands
+
+            self.add_cog(DiagnosticsCommands(config))
+
+    # The worker process client (and multiprocessing with it) is only loaded when configured
+    @staticmethod
+    def _create_socket(config: ADOSConfig) -> SocketClient:
+        if config.socket_mode == SocketMode.WORKER_PROCESS:
+            # pylint: disable = import-outside-toplevel
+            from ados.arch.worker import WorkerSocketClient
+
+            return WorkerSocketClient(config, slot_name=config.archipelago_slot, game="Archipelago", fetch_data=True)
+        return SocketClient(config, slot_name=config.archipelago_slot, game="Archipelago", fetch_data=True)
+
+    # Help output is rendered whenever the set of registered commands changes
+    def add_cog(self, cog: commands.Cog, *, override: bool = False) -> None:
+        super().add_cog(cog, override=override)
+        self._help_pages.rebuild(self)
+
+    def remove_cog(self, name: str) -> Optional[commands.Cog]:
+        cog = super().remove_cog(name)
+        self._help_pages.rebuild(self)
+        return cog
 
     async def execute(self) -> None:
         _log.info("Starting ArchipelaDOS bot with configuration: %s", self._config.model_dump_json())
-        await self._web.refresh()
-        await self._socket.connect(self._web.server_url)
-        await super().start(self._config.discord_token)
+        await self._metrics.start()
+        await self._state.start()
+        # Discord logs in straight away, so commands are answered from the snapshot while the
+        # (possibly slow, or failing) Archipelago handshake happens in the background
+        connect_task = asyncio.create_task(self._connect_archipelago())
+        try:
+            await super().start(self._config.discord_token)
+        finally:
+            connect_task.cancel()
+            await asyncio.gather(connect_task, return_exceptions=True)
+            await self._state.stop()
+            await self._metrics.stop()
+            self._charts.close()
         _log.info("Stopping ArchipelaDOS bot")
 
+    # Connects to the Archipelago server, retrying with exponential backoff until it succeeds (or
+    # until a refresh command has connected in the meantime)
+    async def _connect_archipelago(self) -> None:
+        delay = CONNECT_RETRY_MIN
+        while not self._socket.connected:
+            try:
+                await self._socket.connect(await self._web.refresh())
+                return
+            except Exception as ex:
+                _log.error("Failed to connect to Archipelago room (retrying in %.0f seconds): %s", delay, ex)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, CONNECT_RETRY_MAX)
+
     async def on_ready(self) -> None:
         _log.info("Connected to Discord with ID: %d", self.application_id)
 
@@ -104,18 +210,30 @@ class ADOSBot(commands.Bot):
 
         await super().on_message(message)  # type: ignore[no-untyped-call]
 
-        # Always archive bot-created threads, even if not from commands
+        # Always archive bot-created threads, even if not from commands, unless they're still being paged
         if (
             isinstance(message.channel, discord.Thread)
             and message.channel.name == THREAD_NAME
             and not message.channel.archived
+            and message.channel.id not in PAGED_THREADS
         ):
             await message.channel.edit(archived=True)
 
+    async def invoke(self, ctx: BotContext) -> None:
+        start = time.perf_counter()
+        try:
+            await super().invoke(ctx)
+        finally:
+            if ctx.command is not None:
+                elapsed = time.perf_counter() - start
+                COMMAND_SECONDS.observe(elapsed, ctx.command.qualified_name)
+                RECENT_TIMINGS.record("command", ctx.command.qualified_name, elapsed)
+
     # Handles different classes of errors raised during command processing.
     #   - Case #1: User syntax mistakes
     #   - Case #2: Expected failure conditions, likely user mistakes
-    #   - Case #3: Unexpected errors, potentially bugs
+    #   - Case #3: Commands the user is not allowed to run
+    #   - Case #4: Unexpected errors, potentially bugs
     async def on_command_error(self, context: BotContext, exception: CommandError) -> None:
         if isinstance(exception, (CommandNotFound, ConversionError, UserInputError)):
             _log.info("Invalid user command '%s': %s", context.message.content, exception)
@@ -125,6 +243,9 @@ class ADOSBot(commands.Bot):
         elif isinstance(exception, CommandInvokeError) and isinstance(exception.original, ADOSError):
             _log.info("Error running user command '%s': %s", context.message.content, exception.original)
             await send_failure(context, f"Error running command: {exception.original}")
+        elif isinstance(exception, CheckFailure):
+            _log.info("User not permitted to run command '%s': %s", context.message.content, exception)
+            await send_failure(context, "You do not have permission to run this command.")
         else:
             _log.warning("Unexpected error processing user command '%s': %s", context.message.content, exception)
             await send_failure(context, "Something went wrong while processing your command. Try again later.")
@@ -1,5 +1,7 @@
 import random
-from typing import Literal, Optional
+import time
+from collections import deque
+from typing import Iterable, Iterator, Literal, Optional
 
 from discord.ext import commands
 from discord.ext.commands.context import Context
@@ -7,24 +9,53 @@ from discord.ext.commands.errors import UserInputError
 
 from ados.arch.socket import SocketClient
 from ados.arch.web import WebClient
-from ados.common import ADOSError
-from ados.discord.utils import COMMAND_PREFIX, send_message, send_success
+from ados.charts import ChartRenderer, TimelineChart
+from ados.common import ADOSError, ItemLevel, SlotInfo
+from ados.discord.responses import ResponseCache
+from ados.discord.utils import (
+    COMMAND_PREFIX,
+    send_image,
+    send_message,
+    send_pages,
+    send_stream,
+    send_success,
+)
+from ados.items import ReceivedItem
+from ados.metrics import DISCORD_SENDS
 from ados.state import ADOSState
+from ados.timeseries import CHECKS_METRIC, DAY, DEATHS_METRIC, TimeSeries
 
 type BotContext = Context[commands.Bot]
 
 
+# Lists always cover the whole game, so only graphs take a number of days
+def _check_list_days(days: Optional[int]) -> None:
+    if days is not None:
+        raise ADOSError("A number of days can only be given for graphs")
+
+
+# Graphs cover the whole game unless limited to a number of recent days
+def _graph_start(days: Optional[int]) -> Optional[float]:
+    if days is None:
+        return None
+    if days <= 0:
+        raise ADOSError("Number of days must be positive")
+    return time.time() - days * DAY
+
+
 def _strip_quotes(value: Optional[str]) -> Optional[str]:
     return value.strip("'\"") if value else None
 
 
 class Commands(commands.Cog):  # pyright: ignore - pylance hates this pattern
 
-    def __init__(self, state: ADOSState, web: WebClient, socket: SocketClient):
+    def __init__(self, state: ADOSState, web: WebClient, socket: SocketClient, charts: ChartRenderer):
         super().__init__()
         self._state = state
         self._web = web
         self._socket = socket
+        self._charts = charts
+        self._responses = ResponseCache()
 
     class SlotFlags(commands.FlagConverter):
         slot: Optional[str] = None
@@ -75,6 +106,7 @@ class Commands(commands.Cog):  # pyright: ignore - pylance hates this pattern
 
     @commands.command(name="dmme", help="Trigger the bot to send you a direct message", ignore_extra=False)
     async def dmme(self, ctx: BotContext) -> None:
+        DISCORD_SENDS.inc()
         await ctx.message.author.send(random.choice(Commands.GREETINGS))
         await send_success(ctx, "Direct message sent")
 
@@ -84,22 +116,28 @@ class Commands(commands.Cog):  # pyright: ignore - pylance hates this pattern
 
     @commands.command(name="refresh", help="Refresh the room on archipelago.gg", ignore_extra=False)
     async def refresh(self, ctx: BotContext) -> None:
-        await self._web.refresh()
-        await self._socket.connect(self._web.server_url)
+        await self._socket.connect(await self._web.refresh())
         await send_success(ctx, f"Refreshed room data from <{self._web.room_url}>")
 
     @commands.command(name="info", help="Get information about the Archipelago room", ignore_extra=False)
     async def info(self, ctx: BotContext) -> None:
-        port = self._web.server_url.split(":")[-1]
+        version = (self._state.slots_version, self._web.server_url, self._web.tracker_url)
+        await send_pages(ctx, self._responses.get("info", version, self._render_info))
+
+    # The server and tracker are only known once the room page has been fetched, which may still be
+    # pending (or failing) while the bot answers commands from the snapshot
+    def _render_info(self) -> str:
+        server_url, tracker_url = self._web.server_url, self._web.tracker_url
+        port = server_url.split(":")[-1] if server_url is not None else "unknown (not yet connected)"
+        tracker = f"<{tracker_url}>" if tracker_url is not None else "unknown (not yet connected)"
         slots_list = ", ".join(f"`{slot}`" for slot in self._state.all_slots())
-        message = (
+        return (
             f"Room Information:\n"
             f"- Port: {port}\n"
             f"- Room URL: <{self._web.room_url}>\n"
-            f"- Tracker URL: <{self._web.tracker_url}>\n"
+            f"- Tracker URL: {tracker}\n"
             f"- Available Slots: {slots_list}"
         )
-        await send_message(ctx, message)
 
     ################################################
     ########### SLOT MANAGEMENT COMMANDS ###########
@@ -146,11 +184,71 @@ class Commands(commands.Cog):  # pyright: ignore - pylance hates this pattern
 
     @replay.command(name="recent", help="Replay items received since last call (can filter by slot/item level)", ignore_extra=False)  # type: ignore[arg-type]
     async def replay_recent(self, ctx: BotContext, *, flags: SlotLevelFlags) -> None:
-        raise ADOSError("Not yet implemented")  # TODO: Implement
+        user_id = ctx.author.id
+        slots = self._replay_slots(user_id, flags.slot)
+        levels = ItemLevel.parse(flags.level)
+
+        # Only items whose lines have actually been sent are marked as replayed, so that pages left
+        # behind an unpressed "Next page" button come up again in the next replay
+        unsent: deque[tuple[int, int]] = deque()  # Slot ID and position of each item rendered but not yet sent
+
+        def _lines() -> Iterator[str]:
+            for slot in slots:
+                received = self._state.received_items(slot.id, levels, unreplayed_by=user_id)
+                for item, line in self._render_received(slot, received):
+                    unsent.append((slot.id, item.position))
+                    yield line
+
+        sent = 0
+
+        def _mark_sent(count: int) -> None:
+            nonlocal sent
+            positions: dict[int, int] = {}
+            for _ in range(count - sent):
+                slot_id, position = unsent.popleft()
+                positions[slot_id] = position + 1
+            sent = count
+            if positions:
+                self._state.mark_replayed(user_id, positions)
+
+        if not await send_stream(ctx, _lines(), reply=True, on_sent=_mark_sent):
+            await send_message(ctx, "No new items have been received since your last replay")
 
     @replay.command(name="all", help="Replay all items recieved since game start (can filter by slot/item level)", ignore_extra=False)  # type: ignore[arg-type]
     async def replay_all(self, ctx: BotContext, *, flags: SlotLevelFlags) -> None:
-        raise ADOSError("Not yet implemented")  # TODO: Implement
+        slots = self._replay_slots(ctx.author.id, flags.slot)
+        levels = ItemLevel.parse(flags.level)
+        received = [(slot, self._state.received_items(slot.id, levels)) for slot in slots]
+        lines = (line for slot, items in received for _, line in self._render_received(slot, items))
+        if not await send_stream(ctx, lines, reply=True):
+            await send_message(ctx, "No items have been received yet")
+
+    # The user's registered slots, or just the given one (which must be among them)
+    def _replay_slots(self, user_id: int, slot_name: Optional[str]) -> list[SlotInfo]:
+        slots = self._state.user_slots(user_id)
+        if not slots:
+            raise ADOSError(f"You are not registered for any slots; use `{COMMAND_PREFIX}slot add` first")
+        if slot_name is not None:
+            slot = self._state.resolve_slot(slot_name)
+            if slot not in slots:
+                raise ADOSError(f"You are not registered for slot `{slot}`")
+            return [slot]
+        return sorted(slots, key=str)
+
+    # One line per received item, along with the item; the first line is headed by the receiving slot
+    def _render_received(self, slot: SlotInfo, received: Iterable[ReceivedItem]) -> Iterator[tuple[ReceivedItem, str]]:
+        for index, item in enumerate(received):
+            header = f"Items received by `{slot}`:\n" if index == 0 else ""
+            item_info = self._state.item_by_id(slot.game, item.item_id)
+            item_name = str(item_info) if item_info is not None else f"Unknown item {item.item_id}"
+            levels = ", ".join(level.name.lower() for level in item.level)  # type: ignore[union-attr]
+            sender = self._state.slot_by_id(item.sender_id)
+            if sender is None or item.location_id < 0:
+                yield item, f"{header}- `{item_name}` ({levels})"
+                continue
+            location_info = self._state.location_by_id(sender.game, item.location_id)
+            location_name = str(location_info) if location_info is not None else f"Unknown location {item.location_id}"
+            yield item, f"{header}- `{item_name}` ({levels}) from `{sender}` at `{location_name}`"
 
     @commands.command(name="ketchmeup", help=f"Alias of '{COMMAND_PREFIX}replay recent'", ignore_extra=False)
     async def ketchmeup(self, ctx: BotContext, *, flags: SlotLevelFlags) -> None:
@@ -208,10 +306,58 @@ class Commands(commands.Cog):  # pyright: ignore - pylance hates this pattern
     ################ STATS COMMANDS ################
     ################################################
 
-    @commands.command(name="checks", help="Outputs data on completed/total checks per slot", ignore_extra=False)
-    async def checks(self, ctx: BotContext, mode: Literal["list", "graph"]) -> None:
-        raise ADOSError("Not yet implemented")  # TODO: Implement
-
-    @commands.command(name="deaths", help="Outputs data on death links triggered per slot", ignore_extra=False)
-    async def deaths(self, ctx: BotContext, mode: Literal["list", "graph"]) -> None:
-        raise ADOSError("Not yet implemented")  # TODO: Implement
+    @commands.command(
+        name="checks",
+        help="Outputs data on completed checks per slot (graphs can be limited to recent days)",
+        ignore_extra=False,
+    )
+    async def checks(self, ctx: BotContext, mode: Literal["list", "graph"], days: Optional[int] = None) -> None:
+        version = (self._state.checks_version, self._state.slots_version)
+        if mode == "list":
+            _check_list_days(days)
+            render = lambda: self._render_counts("Checks completed per slot", self._state.check_counts())
+            await send_pages(ctx, self._responses.get("checks", version, render))
+        else:
+            start = _graph_start(days)
+            image = await self._charts.render(("checks", days), version, lambda: self._checks_chart(start))
+            await send_image(ctx, "Checks completed per slot:", image, "checks.png")
+
+    @commands.command(
+        name="deaths",
+        help="Outputs data on death links triggered per slot (graphs can be limited to recent days)",
+        ignore_extra=False,
+    )
+    async def deaths(self, ctx: BotContext, mode: Literal["list", "graph"], days: Optional[int] = None) -> None:
+        version = (self._state.deaths_version, self._state.slots_version)
+        if mode == "list":
+            _check_list_days(days)
+            render = lambda: self._render_counts("Death links triggered per slot", self._state.death_counts())
+            await send_pages(ctx, self._responses.get("deaths", version, render))
+        else:
+            start = _graph_start(days)
+            image = await self._charts.render(("deaths", days), version, lambda: self._deaths_chart(start))
+            await send_image(ctx, "Death links triggered per slot:", image, "deaths.png")
+
+    def _render_counts(self, title: str, counts: dict[int, int]) -> str:
+        slots = sorted(self._state.all_slots(), key=lambda slot: (-counts.get(slot.id, 0), str(slot)))
+        message_lines = [f"{title}:"]
+        message_lines.extend(f"- `{slot}`: {counts.get(slot.id, 0)}" for slot in slots)
+        return "\n".join(message_lines)
+
+    async def _checks_chart(self, start: Optional[float]) -> TimelineChart:
+        series = self._chart_series(await self._state.history(CHECKS_METRIC, start))
+        return TimelineChart(title="Checks completed per slot", ylabel="Checks", series=series)
+
+    async def _deaths_chart(self, start: Optional[float]) -> TimelineChart:
+        series = self._chart_series(await self._state.history(DEATHS_METRIC, start))
+        return TimelineChart(title="Death links triggered per slot", ylabel="Deaths", series=series)
+
+    # Labels history by slot name, and extends every line up to the present
+    def _chart_series(self, history: dict[int, TimeSeries]) -> dict[str, TimeSeries]:
+        now = time.time()
+        slots = {slot.id: str(slot) for slot in self._state.all_slots()}
+        return {
+            slots.get(slot_id, f"Slot {slot_id}"): [*points, (now, points[-1][1])]
+            for slot_id, points in history.items()
+            if points
+        }
@@ -0,0 +1,131 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from datetime import datetime
+from typing import Literal, Optional
+
+from discord.ext import commands
+from discord.ext.commands.context import Context
+from discord.ext.commands.errors import UserInputError
+
+from ados.common import ADOSError
+from ados.config import ADOSConfig, LoggingBehavior
+from ados.discord.utils import COMMAND_PREFIX, send_file, send_message, send_success
+from ados.metrics import RECENT_TIMINGS
+
+type BotContext = Context[commands.Bot]
+
+MAX_PROFILE_SECONDS = 600
+STATS_LINES = 60
+MEMORY_LINES = 40
+SLOWEST_COUNT = 20
+
+
+# Live diagnostics for a running bot, restricted to server administrators. Only registered when
+# diagnostics_enabled is set. Profiles cover everything on the event loop thread, i.e. the socket
+# loop, message handlers, and command handlers (but not a worker process, if one is used).
+class DiagnosticsCommands(commands.Cog):  # pyright: ignore - pylance hates this pattern
+
+    def __init__(self, config: ADOSConfig):
+        super().__init__()
+        self._config = config
+        self._profiling = False
+        self._memory_baseline: Optional[tracemalloc.Snapshot] = None
+
+    def cog_check(self, ctx: BotContext) -> bool:  # type: ignore[override]
+        permissions = getattr(ctx.author, "guild_permissions", None)
+        return permissions is not None and permissions.administrator
+
+    # Results go next to the log files if there are any, and into the data directory otherwise
+    def _output_path(self, name: str) -> str:
+        if self._config.logging_behavior in (LoggingBehavior.NONE, LoggingBehavior.CONSOLE_ONLY):
+            directory = self._config.data_path
+        elif self._config.logging_behavior.uses_directory:
+            assert self._config.logging_path is not None
+            directory = self._config.logging_path
+        else:
+            assert self._config.logging_path is not None
+            directory = os.path.dirname(os.path.abspath(self._config.logging_path))
+        os.makedirs(directory, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(directory, f"ados_{self._config.archipelago_room}_{name}_{timestamp}")
+
+    @commands.group(name="diag", help="Live diagnostics (administrators only)", invoke_without_command=True, hidden=True)  # type: ignore[arg-type]
+    async def diag(self, ctx: BotContext) -> None:
+        raise UserInputError(f"Must specify a sub-command for `{COMMAND_PREFIX}diag`")
+
+    @diag.command(name="profile", help="Profile the bot for the given number of seconds", ignore_extra=False)  # type: ignore[arg-type]
+    async def diag_profile(self, ctx: BotContext, seconds: int) -> None:
+        if not 0 < seconds <= MAX_PROFILE_SECONDS:
+            raise ADOSError(f"Profile duration must be between 1 and {MAX_PROFILE_SECONDS} seconds")
+        if self._profiling:
+            raise ADOSError("A profile is already running")
+
+        self._profiling = True
+        profiler = cProfile.Profile()
+        try:
+            await send_success(ctx, f"Profiling for {seconds} seconds")
+            profiler.enable()
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+            self._profiling = False
+
+        base_path = self._output_path("profile")
+        stats_path = await asyncio.to_thread(self._write_profile, profiler, base_path)
+        await send_file(ctx, f"Profile complete; raw data saved to `{base_path}.prof`", stats_path)
+
+    @staticmethod
+    def _write_profile(profiler: cProfile.Profile, base_path: str) -> str:
+        profiler.dump_stats(f"{base_path}.prof")
+        stats_text = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stats_text)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(STATS_LINES)
+        stats_path = f"{base_path}.txt"
+        with open(stats_path, "w") as stats_file:
+            stats_file.write(stats_text.getvalue())
+        return stats_path
+
+    @diag.command(name="memory", help="Start, diff against, or stop memory allocation tracing", ignore_extra=False)  # type: ignore[arg-type]
+    async def diag_memory(self, ctx: BotContext, mode: Literal["start", "diff", "stop"]) -> None:
+        if mode == "start":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._memory_baseline = tracemalloc.take_snapshot()
+            await send_success(ctx, "Memory tracing started; baseline snapshot taken")
+        elif mode == "stop":
+            tracemalloc.stop()
+            self._memory_baseline = None
+            await send_success(ctx, "Memory tracing stopped")
+        else:
+            if self._memory_baseline is None or not tracemalloc.is_tracing():
+                raise ADOSError(f"Memory tracing is not running; use `{COMMAND_PREFIX}diag memory start` first")
+            snapshot = tracemalloc.take_snapshot()
+            diff_path = await asyncio.to_thread(self._write_memory_diff, snapshot, self._memory_baseline)
+            current, peak = tracemalloc.get_traced_memory()
+            message = f"Traced memory: {current / 1024 / 1024:.1f} MiB (peak {peak / 1024 / 1024:.1f} MiB)"
+            await send_file(ctx, message, diff_path)
+
+    def _write_memory_diff(self, snapshot: tracemalloc.Snapshot, baseline: tracemalloc.Snapshot) -> str:
+        diff_path = f"{self._output_path('memory')}.txt"
+        with open(diff_path, "w") as diff_file:
+            for stat in snapshot.compare_to(baseline, "lineno")[:MEMORY_LINES]:
+                diff_file.write(f"{stat}\n")
+        return diff_path
+
+    @diag.command(name="slow", help="List the slowest recent message handlers and commands", ignore_extra=False)  # type: ignore[arg-type]
+    async def diag_slow(self, ctx: BotContext) -> None:
+        entries = RECENT_TIMINGS.slowest(SLOWEST_COUNT)
+        if not entries:
+            await send_message(ctx, "No handler or command timings have been recorded yet")
+            return
+
+        message_lines = ["Slowest recent handlers and commands:"]
+        for entry in entries:
+            when = datetime.fromtimestamp(entry.timestamp).strftime("%H:%M:%S")
+            message_lines.append(f"  {entry.seconds * 1000:9.1f} ms  {when}  {entry.kind:<8} {entry.name}")
+        message = "\n".join(message_lines)
+        await send_message(ctx, f"```{message}```")
@@ -1,9 +1,12 @@
-from typing import NamedTuple, Optional
+import itertools
+from typing import Any, Iterable, NamedTuple, Optional, Self
 
 from discord.ext import commands
 from discord.ext.commands.flags import FlagsMeta
 
-from ados.discord.utils import COMMAND_PREFIX, send_failure, send_message
+from ados.discord.utils import COMMAND_PREFIX, paginate, send_failure, send_pages
+
+BOT_HELP_KEY = ""
 
 
 class CommandData(NamedTuple):
@@ -11,85 +14,129 @@ class CommandData(NamedTuple):
     brief: str
 
 
+# Help output never changes once the commands are registered, so it is rendered and paginated
+# ahead of time (whenever a cog is added or removed) rather than on every help request. Keys are
+# qualified command names, with the main help output under BOT_HELP_KEY.
+class HelpPages:
+
+    def __init__(self) -> None:
+        self._pages: dict[str, list[str]] = {}
+
+    # py-cord deep copies the help command's arguments for every invocation; the rendered pages
+    # are meant to be shared by all of those copies
+    def __deepcopy__(self, memo: dict[int, Any]) -> Self:
+        return self
+
+    def rebuild(self, bot: commands.Bot) -> None:
+        pages = {BOT_HELP_KEY: paginate(render_bot_help(bot.commands), code_block=True)}
+        for command in bot.walk_commands():
+            if isinstance(command, commands.Group):
+                pages[command.qualified_name] = paginate(render_group_help(command), code_block=True)
+            else:
+                pages[command.qualified_name] = paginate(render_command_help(command), code_block=True)
+        self._pages = pages
+
+    def get(self, key: str) -> Optional[list[str]]:
+        return self._pages.get(key)
+
+
+# Main help output, i.e. "!help"
+def render_bot_help(bot_commands: Iterable[commands.Command]) -> str:  # type: ignore[type-arg]
+    all_commands: list[CommandData] = []
+    for command in bot_commands:
+        if command.hidden:
+            continue
+        name = command.name
+        brief = command.brief or command.help or ""
+        if isinstance(command, commands.Group):
+            # We want to expose sub-commands in the main help listing, so these get added here
+            subcommands = [sub.name for sub in command.commands]
+            subcommands.sort()
+            name += f" <{ '|'.join(subcommands) }>"
+        all_commands.append(CommandData(name, brief))
+    all_commands.sort(key=lambda data: data.name)
+
+    message_lines: list[str] = []
+    message_lines.append("Available commands:")
+    name_len = max(len(data.name) for data in all_commands)
+    for data in all_commands:
+        padding = " " * (name_len - len(data.name))
+        message_lines.append(f"  {COMMAND_PREFIX}{data.name}{padding}  {data.brief}")
+
+    message_lines.append(f"\nType '{COMMAND_PREFIX}help <command>' for more info on a particular command.")
+    return "\n".join(message_lines)
+
+
+# Help for a specific command group, i.e. "!help slot"
+def render_group_help(group: commands.Group) -> str:  # type: ignore[type-arg]
+    all_commands: list[CommandData] = []
+    for command in group.commands:
+        name = command.name
+        brief = command.brief or command.help or ""
+        all_commands.append(CommandData(name, brief))
+    all_commands.sort(key=lambda data: data.name)
+
+    message_lines: list[str] = []
+    message_lines.append(f"{COMMAND_PREFIX}{group.name}\n")
+    if group.help:
+        message_lines.append(f"{group.help}\n")
+    message_lines.append("Available sub-commands:")
+
+    name_len = max(len(data.name) for data in all_commands)
+    for data in all_commands:
+        padding = " " * (name_len - len(data.name))
+        message_lines.append(f"  {data.name}{padding}  {data.brief}")
+
+    message_lines.append(f"\nType '{COMMAND_PREFIX}help {group.name} <command>' for more info on a particular command.")
+    return "\n".join(message_lines)
+
+
+# Help for a specific command, i.e. "!help hello" or "!help slot add"
+def render_command_help(command: commands.Command) -> str:  # type: ignore[type-arg]
+
+    # The default signature does not expose flag names properly, so we perform some custom
+    # logic to pull flag names out of FlagConverter parameters
+    signature = command.signature
+    for param in command.params.values():
+        if not isinstance(param.annotation, FlagsMeta):
+            continue
+        flags: list[str] = []
+        for flag_name in param.annotation.__commands_flags__:
+            flags.append(f"[{flag_name}:...]")
+        signature = signature.replace(f"<{param.name}>", " ".join(flags))
+
+    message_lines: list[str] = []
+    message_lines.append(f"{COMMAND_PREFIX}{command.qualified_name} {signature}")
+    if command.help:
+        message_lines.append(f"\n{command.help}")
+    return "\n".join(message_lines)
+
+
 # We implement our own help command so that we can better expose the sub-command structure
-# in the main help output, and provide proper flag names in the per-command help output
+# in the main help output, and provide proper flag names in the per-command help output.
+# Output comes from the pre-rendered HelpPages, falling back to rendering on the spot.
 class HelpCommand(commands.HelpCommand):
 
+    def __init__(self, pages: HelpPages, **options: Any):
+        super().__init__(**options)  # type: ignore[no-untyped-call]
+        self._pages = pages
+
     # Called when the main "!help" command is invoked
     async def send_bot_help(self, mapping: dict[Optional[commands.Cog], list[commands.Command]]) -> None:  # type: ignore[type-arg]
-
         # For our purposes, we do not care about grouping commands by cog
-        all_commands: list[CommandData] = []
-        for _, cog_commands in mapping.items():
-            for command in cog_commands:
-                name = command.name
-                brief = command.brief or command.help or ""
-                if isinstance(command, commands.Group):
-                    # We want to expose sub-commands in the main help listing, so these get added here
-                    subcommands = [sub.name for sub in command.commands]
-                    subcommands.sort()
-                    name += f" <{ '|'.join(subcommands) }>"
-                all_commands.append(CommandData(name, brief))
-        all_commands.sort(key=lambda data: data.name)
-
-        message_lines: list[str] = []
-        message_lines.append("Available commands:")
-        name_len = max(len(data.name) for data in all_commands)
-        for data in all_commands:
-            padding = " " * (name_len - len(data.name))
-            message_lines.append(f"  {COMMAND_PREFIX}{data.name}{padding}  {data.brief}")
-
-        message_lines.append("\nType '{COMMAND_PREFIX}help <command>' for more info on a particular command.")
-        message = "\n".join(message_lines)
-        await send_message(self.context, f"```{message}```", reply=True)
+        bot_commands = itertools.chain.from_iterable(mapping.values())
+        pages = self._pages.get(BOT_HELP_KEY) or paginate(render_bot_help(bot_commands), code_block=True)
+        await send_pages(self.context, pages, reply=True)
 
     # Called when help is requested for a specific command group, i.e. "!help slot"
     async def send_group_help(self, group: commands.Group) -> None:  # type: ignore[type-arg]
-        all_commands: list[CommandData] = []
-        for command in group.commands:
-            name = command.name
-            brief = command.brief or command.help or ""
-            all_commands.append(CommandData(name, brief))
-        all_commands.sort(key=lambda data: data.name)
-
-        message_lines: list[str] = []
-        message_lines.append(f"{COMMAND_PREFIX}{group.name}\n")
-        if group.help:
-            message_lines.append(f"{group.help}\n")
-        message_lines.append("Available sub-commands:")
-
-        name_len = max(len(data.name) for data in all_commands)
-        for data in all_commands:
-            padding = " " * (name_len - len(data.name))
-            message_lines.append(f"  {data.name}{padding}  {data.brief}")
-
-        message_lines.append(
-            f"\nType '{COMMAND_PREFIX}help {group.name} <command>' for more info on a particular command."
-        )
-        message = "\n".join(message_lines)
-        await send_message(self.context, f"```{message}```", reply=True)
+        pages = self._pages.get(group.qualified_name) or paginate(render_group_help(group), code_block=True)
+        await send_pages(self.context, pages, reply=True)
 
     # Called when help is requested for a specific command, i.e. "!help hello" or "!help slot add"
     async def send_command_help(self, command: commands.Command) -> None:  # type: ignore[type-arg]
-
-        # The default signature does not expose flag names properly, so we perform some custom
-        # logic to pull flag names out of FlagConverter parameters
-        signature = command.signature
-        for param in command.params.values():
-            if not isinstance(param.annotation, FlagsMeta):
-                continue
-            flags: list[str] = []
-            for flag_name in param.annotation.__commands_flags__:
-                flags.append(f"[{flag_name}:...]")
-            signature = signature.replace(f"<{param.name}>", " ".join(flags))
-
-        message_lines: list[str] = []
-        message_lines.append(f"{COMMAND_PREFIX}{command.qualified_name} {signature}")
-        if command.help:
-            message_lines.append(f"\n{command.help}")
-
-        message = "\n".join(message_lines)
-        await send_message(self.context, f"```{message}```", reply=True)
+        pages = self._pages.get(command.qualified_name) or paginate(render_command_help(command), code_block=True)
+        await send_pages(self.context, pages, reply=True)
 
     async def send_error_message(self, error: str) -> None:
         await send_failure(self.context, error)
@@ -0,0 +1,25 @@
+from collections.abc import Hashable
+from typing import Callable, NamedTuple
+
+from ados.discord.utils import paginate
+
+
+class _CachedResponse(NamedTuple):
+    version: Hashable
+    pages: list[str]
+
+
+# Rendered command responses, stored already split into pages. Every entry is tagged with the
+# version of the data it was rendered from (e.g. ADOSState.slots_version); a lookup with a
+# different version renders the response again, so bumping the version is all it takes to
+# invalidate the entries derived from it.
+class ResponseCache:
+
+    def __init__(self) -> None:
+        self._entries: dict[Hashable, _CachedResponse] = {}
+
+    def get(self, key: Hashable, version: Hashable, render: Callable[[], str], code_block: bool = False) -> list[str]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            entry = self._entries[key] = _CachedResponse(version, paginate(render(), code_block=code_block))
+        return entry.pages
@@ -1,24 +1,215 @@
+import asyncio
+import io
+import time
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator, Optional
+
 import discord
 from discord.ext import commands
 from discord.ext.commands.context import Context
 
+from ados.metrics import DISCORD_SENDS
+
 type BotContext = Context[commands.Bot]
 
 COMMAND_PREFIX = "!"
 THREAD_NAME = "ArchipelaDOS"
+MESSAGE_LIMIT = 2000
+CODE_BLOCK = "```"
+
+# Streamed output sends this many pages straight away, then waits for the user to ask for more
+STREAM_PAGES = 5
+STREAM_TIMEOUT = 900.0
+
+# Discord allows around 5 messages per 5 seconds in a channel; streamed pages are paced to stay
+# within that rather than relying on being throttled after the fact
+CHANNEL_RATE_MESSAGES = 5
+CHANNEL_RATE_PERIOD = 5.0
+
+
+# Splits text into pages of at most 'limit' characters, breaking between lines where possible
+# (lines which are too long on their own are split across pages). With code_block set, every
+# page is wrapped in its own code block, and the wrapping counts towards the limit.
+def paginate(text: str, limit: int = MESSAGE_LIMIT, code_block: bool = False) -> list[str]:
+    if code_block:
+        return [f"{CODE_BLOCK}{page}{CODE_BLOCK}" for page in paginate(text, limit - 2 * len(CODE_BLOCK))]
+    return list(paginate_lines(text.split("\n"), limit))
+
+
+# Packs lines into pages as paginate() does, but lazily: lines are only pulled from 'lines' as
+# each page is filled, so long (or generated) output never has to be held in memory all at once
+def paginate_lines(lines: Iterable[str], limit: int = MESSAGE_LIMIT) -> Iterator[str]:
+    return (page for page, _ in _paginate_counted(lines, limit))
+
+
+# As paginate_lines, but each page comes with the number of lines which are complete once it has
+# been sent (a line which is too long for one page only counts with its last part)
+def _paginate_counted(lines: Iterable[str], limit: int) -> Iterator[tuple[str, int]]:
+    current: list[str] = []
+    current_len = -1  # No separator before the first line
+    completed = 0
+    for line in lines:
+        while len(line) > limit:
+            if current:
+                yield "\n".join(current), completed
+                current, current_len = [], -1
+            yield line[:limit], completed
+            line = line[limit:]
+        if current_len + 1 + len(line) > limit:
+            yield "\n".join(current), completed
+            current, current_len = [], -1
+        current.append(line)
+        current_len += 1 + len(line)
+        completed += 1
+    if current:
+        yield "\n".join(current), completed
 
 
 # For some user commands, we want the ability to reply by starting a thread
 # rather than posting directly in the channel. This is controlled by the 'reply' flag.
 async def send_message(ctx: BotContext, message: str, reply: bool = False) -> None:
+    await send_pages(ctx, [message], reply)
+
+
+# Sends pre-paginated output as consecutive messages. When replying in a thread, all of the
+# pages go into the same thread.
+async def send_pages(ctx: BotContext, pages: list[str], reply: bool = False) -> None:
     if not reply or isinstance(ctx.channel, (discord.DMChannel, discord.Thread)):
-        await ctx.send(message)
+        for page in pages:
+            DISCORD_SENDS.inc()
+            await ctx.send(page)
     else:
         new_thread = await ctx.message.create_thread(name=THREAD_NAME)
-        await new_thread.send(message)
+        for page in pages:
+            DISCORD_SENDS.inc()
+            await new_thread.send(page)
         await new_thread.edit(archived=True)
 
 
+# Sends output as pages which are only built as they are sent: lines are pulled from 'lines' (which
+# may be a generator) one page at a time, so a long listing is never held in memory in full. The
+# first STREAM_PAGES pages are sent immediately, and any after that one at a time through a
+# "Next page" button for the user who ran the command. After each page is sent, 'on_sent' (if
+# given) is called with the number of lines sent so far, so callers can tell what the user has
+# actually seen. Returns False if there was nothing to send.
+async def send_stream(
+    ctx: BotContext, lines: Iterable[str], reply: bool = False, on_sent: Optional[Callable[[int], None]] = None
+) -> bool:
+    pages = _paginate_counted(lines, MESSAGE_LIMIT)
+    page = next(pages, None)
+    if page is None:
+        return False
+
+    thread = None
+    if reply and not isinstance(ctx.channel, (discord.DMChannel, discord.Thread)):
+        thread = await ctx.message.create_thread(name=THREAD_NAME)
+    destination: discord.abc.Messageable = ctx if thread is None else thread
+    channel_id = ctx.channel.id if thread is None else thread.id
+    view = None
+    for count in range(1, STREAM_PAGES + 1):
+        following = next(pages, None)
+        if count == STREAM_PAGES and following:
+            view = _NextPageView(ctx.author.id, following, pages, on_sent, channel_id, thread)
+        await CHANNEL_PACER.wait(channel_id)
+        DISCORD_SENDS.inc()
+        if view is None:
+            await destination.send(page[0])
+        else:
+            await destination.send(page[0], view=view)
+        if on_sent is not None:
+            on_sent(page[1])
+        if following is None or view is not None:
+            break
+        page = following
+    if thread is not None and view is None:
+        await thread.edit(archived=True)
+    return True
+
+
+# Keeps recent send times per channel, and delays a send when it would exceed the rate limit
+class _ChannelPacer:
+
+    def __init__(self) -> None:
+        self._sends: dict[int, deque[float]] = {}
+
+    async def wait(self, channel_id: int) -> None:
+        sends = self._sends.setdefault(channel_id, deque(maxlen=CHANNEL_RATE_MESSAGES))
+        if len(sends) == CHANNEL_RATE_MESSAGES:
+            await asyncio.sleep(max(0.0, sends[0] + CHANNEL_RATE_PERIOD - time.monotonic()))
+        now = time.monotonic()
+        sends.append(now)
+        for stale_id in [key for key, times in self._sends.items() if times[-1] < now - CHANNEL_RATE_PERIOD]:
+            del self._sends[stale_id]
+
+
+CHANNEL_PACER = _ChannelPacer()
+
+
+# IDs of reply threads that still have a live "Next page" button, which shouldn't be archived yet
+PAGED_THREADS: set[int] = set()
+
+
+# Button attached to the last page of streamed output sent so far. Pressing it takes the button
+# off that page and sends the next one (with a new button if there are still more to come). The
+# reply thread, if any, is kept open until the last page is sent or the button times out.
+class _NextPageView(discord.ui.View):
+
+    def __init__(
+        self,
+        author_id: int,
+        page: tuple[str, int],
+        pages: Iterator[tuple[str, int]],
+        on_sent: Optional[Callable[[int], None]],
+        channel_id: int,
+        thread: Optional[discord.Thread],
+    ):
+        super().__init__(timeout=STREAM_TIMEOUT, disable_on_timeout=True)
+        self._author_id = author_id
+        self._page = page
+        self._pages = pages
+        self._on_sent = on_sent
+        self._channel_id = channel_id
+        self._thread = thread
+        if thread is not None:
+            PAGED_THREADS.add(thread.id)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user is not None and interaction.user.id == self._author_id
+
+    async def on_check_failure(self, interaction: discord.Interaction) -> None:
+        await interaction.response.send_message("Only the user who ran the command can page through it", ephemeral=True)
+
+    @discord.ui.button(label="Next page", style=discord.ButtonStyle.primary)
+    async def next_page(
+        self, button: discord.ui.Button[Any], interaction: discord.Interaction  # pylint: disable = unused-argument
+    ) -> None:
+        if self.is_finished():
+            return  # Already pressed
+        self.stop()
+        await interaction.response.edit_message(view=None)
+        following = next(self._pages, None)
+        await CHANNEL_PACER.wait(self._channel_id)
+        DISCORD_SENDS.inc()
+        if following is None:
+            await interaction.followup.send(self._page[0])
+        else:
+            view = _NextPageView(self._author_id, following, self._pages, self._on_sent, self._channel_id, self._thread)
+            await interaction.followup.send(self._page[0], view=view)
+        if self._on_sent is not None:
+            self._on_sent(self._page[1])
+        if following is None:
+            await self._archive_thread()
+
+    async def on_timeout(self) -> None:
+        await super().on_timeout()
+        await self._archive_thread()
+
+    async def _archive_thread(self) -> None:
+        if self._thread is not None:
+            PAGED_THREADS.discard(self._thread.id)
+            await self._thread.edit(archived=True)
+
+
 async def send_success(ctx: BotContext, message: str, reply: bool = False) -> None:
     message = f":green_circle:  *{message}*"
     await send_message(ctx, message, reply)
@@ -27,3 +218,13 @@ async def send_success(ctx: BotContext, message: str, reply: bool = False) -> No
 async def send_failure(ctx: BotContext, message: str, reply: bool = False) -> None:
     message = f":red_circle:  *{message}*"
     await send_message(ctx, message, reply)
+
+
+async def send_file(ctx: BotContext, message: str, file_path: str) -> None:
+    DISCORD_SENDS.inc()
+    await ctx.send(message, file=discord.File(file_path))
+
+
+async def send_image(ctx: BotContext, message: str, image: bytes, file_name: str) -> None:
+    DISCORD_SENDS.inc()
+    await ctx.send(message, file=discord.File(io.BytesIO(image), filename=file_name))
@@ -0,0 +1,119 @@
+import heapq
+import logging
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Iterator, NamedTuple
+
+from ados.common import ItemLevel
+
+_log = logging.getLogger(__name__)
+
+ALL_LEVELS = ~ItemLevel(0)
+RECEIVED_RECORD = struct.Struct("<qqqqB")  # receiving slot id, item id, sending slot id, location id, item level
+
+
+# A single item received by a slot, as recorded from an item send
+class ReceivedItem(NamedTuple):
+    position: int  # Index of the item among everything the slot has received
+    item_id: int
+    sender_id: int
+    location_id: int
+    level: ItemLevel
+
+
+# Everything received by a single slot, stored column-wise in typed arrays (a few dozen bytes per
+# item rather than a few hundred for tuples). Each level also keeps the positions of its items,
+# so that a filtered query only visits matching items.
+class _SlotItems:
+
+    def __init__(self) -> None:
+        self.items = array("q")
+        self.senders = array("q")
+        self.locations = array("q")
+        self.levels = array("B")
+        self.level_positions = {level: array("L") for level in ItemLevel}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def append(self, item_id: int, sender_id: int, location_id: int, level: ItemLevel) -> None:
+        for single_level in level:
+            self.level_positions[single_level].append(len(self.items))
+        self.items.append(item_id)
+        self.senders.append(sender_id)
+        self.locations.append(location_id)
+        self.levels.append(level)
+
+    def record(self, position: int) -> ReceivedItem:
+        level = ItemLevel(self.levels[position])
+        return ReceivedItem(position, self.items[position], self.senders[position], self.locations[position], level)
+
+    # Positions in [start, end) of items with any of the given levels, in order. An item can have
+    # more than one level, so merged positions are deduplicated.
+    def positions(self, levels: ItemLevel, start: int, end: int) -> Iterator[int]:
+        if levels & ALL_LEVELS == ALL_LEVELS:
+            yield from range(start, end)
+            return
+
+        walks = []
+        for level in levels:
+            positions = self.level_positions[level]
+            walks.append(positions[bisect_left(positions, start) : bisect_left(positions, end)])
+        previous = -1
+        for position in heapq.merge(*walks):
+            if position != previous:
+                yield position
+                previous = position
+
+
+# History of the items received by every slot, in the order they were sent. Queries are lazy,
+# so callers can stop (or page through results) without visiting the rest of the history. Every
+# item is also appended to a file as it is added, and the file is read back on creation, so that
+# positions in the history stay valid across restarts (and crashes).
+class ItemHistory:
+
+    def __init__(self, path: str):
+        self._slots: dict[int, _SlotItems] = {}
+        self._path = path
+        self._load()
+        self._file = open(path, "ab", buffering=0)  # pylint: disable = consider-using-with
+
+    def add(self, receiver_id: int, item_id: int, sender_id: int, location_id: int, flags: int) -> None:
+        level = ItemLevel.from_flags(flags)
+        self._slot_items(receiver_id).append(item_id, sender_id, location_id, level)
+        self._file.write(RECEIVED_RECORD.pack(receiver_id, item_id, sender_id, location_id, level))
+
+    # The number of items received by a slot, i.e. the position of the next item it receives
+    def count(self, slot_id: int) -> int:
+        slot_items = self._slots.get(slot_id)
+        return 0 if slot_items is None else len(slot_items)
+
+    # Items received by a slot from position 'start' onwards, with any of the given levels. The
+    # result covers the history as of the call, even if it is consumed while more items arrive.
+    def query(self, slot_id: int, levels: ItemLevel = ALL_LEVELS, start: int = 0) -> Iterator[ReceivedItem]:
+        slot_items = self._slots.get(slot_id)
+        if slot_items is None:
+            return iter(())
+        return (slot_items.record(position) for position in slot_items.positions(levels, start, len(slot_items)))
+
+    # A partial record at the end of the file (from a crash mid-write) is dropped
+    def _load(self) -> None:
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, "rb") as history_file:
+            data = history_file.read()
+        size = len(data) - len(data) % RECEIVED_RECORD.size
+        if size != len(data):
+            _log.warning("Dropping partial record at the end of received items file '%s'", self._path)
+            os.truncate(self._path, size)
+        for receiver_id, item_id, sender_id, location_id, level in RECEIVED_RECORD.iter_unpack(data[:size]):
+            self._slot_items(receiver_id).append(item_id, sender_id, location_id, ItemLevel(level))
+        _log.info("Loaded %d received items from '%s'", size // RECEIVED_RECORD.size, self._path)
+
+    def _slot_items(self, slot_id: int) -> _SlotItems:
+        slot_items = self._slots.get(slot_id)
+        if slot_items is None:
+            slot_items = self._slots[slot_id] = _SlotItems()
+        return slot_items
@@ -1,8 +1,44 @@
+import atexit
+import json
 import logging
 import os
 import sys
-
-from ados.config import ADOSConfig, LoggingBehavior
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
+from queue import SimpleQueue
+from typing import Any
+
+from ados.config import ADOSConfig, LoggingBehavior, LoggingFormat
+
+
+# Wraps a potentially huge value (such as a raw socket frame) passed as a logging argument, so
+# that it is only converted to a string if the message is actually emitted, and then only its
+# first characters are. Slicing happens before the conversion, so the cost stays bounded. Bytes
+# are decoded as UTF-8 (a character cut off by the slice is replaced), rather than shown as a repr.
+class Truncated:
+
+    def __init__(self, value: Any, limit: int = 512):
+        self._value = value
+        self._limit = limit
+
+    def __str__(self) -> str:
+        if isinstance(self._value, str):
+            size = len(self._value)
+            text = self._value[: self._limit]
+        elif isinstance(self._value, (bytes, bytearray, memoryview)):
+            size = len(self._value)
+            text = bytes(self._value[: self._limit]).decode("utf-8", errors="replace")
+        else:
+            text = str(self._value)
+            size = len(text)
+            text = text[: self._limit]
+        if size > self._limit:
+            text += f"... ({size - self._limit} more)"
+        return text
 
 
 # Formatter for writing to log files and non-colored console output
@@ -37,34 +73,95 @@ class ColorFormatter(logging.Formatter):
         return formatter.format(record)
 
 
-def initialize_logging(config: ADOSConfig) -> None:
-
-    log = logging.getLogger()
-
-    if config.logging_behavior == LoggingBehavior.NONE:
-        log.disabled = True
-        return
-
-    # Always output to the console when logging is enabled
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(ColorFormatter() if config.logging_color else BasicFormatter())
-    log.addHandler(console_handler)
-    log.setLevel(config.logging_level)
-
-    if config.logging_behavior == LoggingBehavior.CONSOLE_ONLY:
-        return
+# Formatter for structured output, writing each record as a single-line JSON object
+class JsonFormatter(logging.Formatter):
 
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+# Bounds the length of every log message. The message is merged with its arguments once here,
+# so the (possibly threaded) handlers only ever see the truncated text.
+class TruncateFilter(logging.Filter):
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self._limit = limit
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        if len(message) > self._limit:
+            message = f"{message[: self._limit]}... ({len(message) - self._limit} more)"
+        record.msg = message
+        record.args = None
+        return True
+
+
+def _create_file_handler(config: ADOSConfig) -> logging.Handler:
     # Path must be set when logging to a file; this is enforced for the config by pydantic
     assert config.logging_path is not None
 
-    if config.logging_behavior == LoggingBehavior.FILE_DIRECTORY:
+    if config.logging_behavior.uses_directory:
         os.makedirs(config.logging_path, exist_ok=True)
         file_path = os.path.join(config.logging_path, f"ados_{config.archipelago_room}.log")
     else:
         os.makedirs(os.path.dirname(config.logging_path), exist_ok=True)
         file_path = config.logging_path
+
+    if config.logging_behavior == LoggingBehavior.FILE_ROTATE_SIZE:
+        return RotatingFileHandler(
+            file_path, maxBytes=config.logging_rotate_bytes, backupCount=config.logging_rotate_backups
+        )
+    if config.logging_behavior == LoggingBehavior.FILE_ROTATE_TIME:
+        return TimedRotatingFileHandler(
+            file_path, when=config.logging_rotate_when, backupCount=config.logging_rotate_backups
+        )
     mode = "a" if config.logging_behavior == LoggingBehavior.FILE_APPEND else "w"
+    return logging.FileHandler(file_path, mode=mode)
+
+
+def initialize_logging(config: ADOSConfig) -> None:
+
+    log = logging.getLogger()
+
+    if config.logging_behavior == LoggingBehavior.NONE:
+        log.disabled = True
+        return
+
+    json_format = config.logging_format == LoggingFormat.JSON
 
-    file_handler = logging.FileHandler(file_path, mode=mode)
-    file_handler.setFormatter(BasicFormatter())
-    log.addHandler(file_handler)
+    # Always output to the console when logging is enabled
+    console_handler = logging.StreamHandler(sys.stdout)
+    if json_format:
+        console_handler.setFormatter(JsonFormatter())
+    else:
+        console_handler.setFormatter(ColorFormatter() if config.logging_color else BasicFormatter())
+    handlers: list[logging.Handler] = [console_handler]
+
+    if config.logging_behavior != LoggingBehavior.CONSOLE_ONLY:
+        file_handler = _create_file_handler(config)
+        file_handler.setFormatter(JsonFormatter() if json_format else BasicFormatter())
+        handlers.append(file_handler)
+
+    # In threaded mode, the root logger only gets a handler which queues records; the actual
+    # handlers are run by a listener on a background thread, which is flushed on exit
+    if config.logging_threaded:
+        log_queue: SimpleQueue[logging.LogRecord] = SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        handlers = [QueueHandler(log_queue)]
+
+    for handler in handlers:
+        if config.logging_max_message_length is not None:
+            handler.addFilter(TruncateFilter(config.logging_max_message_length))
+        log.addHandler(handler)
+    log.setLevel(config.logging_level)
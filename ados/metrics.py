@@ -0,0 +1,220 @@
+import asyncio
+import heapq
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import deque
+from typing import TYPE_CHECKING, Iterator, NamedTuple, Optional
+
+from ados.config import ADOSConfig
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# Base class for metrics. Every metric keeps one series per distinct combination of label values;
+# recording a sample is a dictionary lookup and an addition, so instrumentation can stay enabled
+# permanently on hot paths.
+class _Metric(ABC):
+
+    TYPE = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]:
+        pass
+
+
+class Counter(_Metric):
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def _samples(self) -> Iterator[str]:
+        for label_values, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value:g}"
+
+
+class Histogram(_Metric):
+
+    TYPE = "histogram"
+
+    # Per-series state: bucket counts (non-cumulative, plus one overflow bucket), sum, and count
+    class _Series:
+        def __init__(self, bucket_count: int):
+            self.buckets = [0] * (bucket_count + 1)
+            self.total = 0.0
+            self.count = 0
+
+    def __init__(
+        self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self._bounds = buckets
+        self._series: dict[tuple[str, ...], Histogram._Series] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = Histogram._Series(len(self._bounds))
+        series.buckets[bisect_left(self._bounds, value)] += 1
+        series.total += value
+        series.count += 1
+
+    def _samples(self) -> Iterator[str]:
+        for label_values, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self._bounds, math.inf), series.buckets):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else f"{bound:g}"
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, f'le="{le}"')} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {series.total:g}"
+            yield f"{self.name}_count{labels} {series.count}"
+
+
+# Holds every metric exposed by the bot and renders them in the Prometheus text format
+class MetricsRegistry:
+
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+# A single timing kept by RecentTimings
+class TimingEntry(NamedTuple):
+    timestamp: float
+    kind: str
+    name: str
+    seconds: float
+
+
+# Keeps the most recent handler and command timings, so the slowest ones can be listed on demand.
+# Histograms only keep aggregates, which do not tell which call was slow or when.
+class RecentTimings:
+
+    def __init__(self, size: int):
+        self._entries: deque[TimingEntry] = deque(maxlen=size)
+
+    def record(self, kind: str, name: str, seconds: float) -> None:
+        self._entries.append(TimingEntry(time.time(), kind, name, seconds))
+
+    def slowest(self, count: int) -> list[TimingEntry]:
+        return heapq.nlargest(count, self._entries, key=lambda entry: entry.seconds)
+
+
+REGISTRY = MetricsRegistry()
+RECENT_TIMINGS = RecentTimings(1024)
+
+SOCKET_FRAMES = REGISTRY.counter(
+    "ados_socket_frames_total", "Websocket frames received, by the command of their first message", ("cmd",)
+)
+SOCKET_BYTES = REGISTRY.counter(
+    "ados_socket_bytes_total", "Websocket payload size received, by the command of their first message", ("cmd",)
+)
+DESERIALIZE_SECONDS = REGISTRY.histogram("ados_deserialize_seconds", "Time spent decoding websocket frames")
+HANDLER_SECONDS = REGISTRY.histogram(
+    "ados_handler_seconds", "Time spent in socket message handlers", ("message", "handler")
+)
+STATE_PERSIST_SECONDS = REGISTRY.histogram("ados_state_persist_seconds", "Time spent writing the state file")
+COMMAND_SECONDS = REGISTRY.histogram("ados_command_seconds", "Time spent processing bot commands", ("command",))
+DISCORD_SENDS = REGISTRY.counter("ados_discord_sends_total", "Messages sent to Discord")
+DISCORD_RATE_LIMITS = REGISTRY.counter("ados_discord_rate_limits_total", "Rate limit (429) responses from Discord")
+CHART_REQUESTS = REGISTRY.counter(
+    "ados_chart_requests_total", "Chart requests, by whether they were cached, shared, or rendered", ("result",)
+)
+CHART_RENDER_SECONDS = REGISTRY.histogram("ados_chart_render_seconds", "Time spent rendering charts")
+EVENT_LOOP_LAG_SECONDS = REGISTRY.histogram("ados_event_loop_lag_seconds", "Delay in waking up the event loop")
+
+
+# Serves the metrics registry over HTTP at /metrics, and samples event loop lag while running.
+# The aiohttp server stack is only imported when the server is actually enabled.
+class MetricsServer:
+
+    LAG_INTERVAL = 1.0
+
+    def __init__(self, config: ADOSConfig):
+        self._host = config.metrics_host
+        self._port = config.metrics_port
+        self._runner: Optional["web.AppRunner"] = None
+        self._lag_task: Optional[asyncio.Task[None]] = None
+
+    async def start(self) -> None:
+        if self._port is None or self._runner is not None:
+            return
+
+        from aiohttp import web  # pylint: disable = import-outside-toplevel
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        self._lag_task = asyncio.create_task(self._monitor_lag())
+        _log.info("Serving metrics at 'http://%s:%d/metrics'", self._host, self._port)
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, _: "web.Request") -> "web.Response":
+        from aiohttp import web  # pylint: disable = import-outside-toplevel
+
+        return web.Response(text=REGISTRY.render(), content_type="text/plain", charset="utf-8")
+
+    async def _monitor_lag(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.LAG_INTERVAL)
+            EVENT_LOOP_LAG_SECONDS.observe(max(0.0, time.perf_counter() - start - self.LAG_INTERVAL))
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from typing import Iterable, Optional
+
+from ados.arch.messages import (
+    ConnectedMessage,
+    LocationInfoMessage,
+    location_scouts_message,
+)
+from ados.arch.socket import SocketClient
+from ados.common import ADOSError, ScoutInfo, SlotInfo
+from ados.config import ADOSConfig
+
+_log = logging.getLogger(__name__)
+
+SCOUT_BATCH_DELAY = 0.05  # How long lookups are gathered before they are sent as one request
+SCOUT_BATCH_SIZE = 1000  # Most locations sent in a single LocationScouts request
+SCOUT_TIMEOUT = 30.0
+SCOUT_IDLE_TIMEOUT = 600.0  # Slot connections unused for this long are closed
+
+
+# A connection to the server as one slot, which is needed because a slot can only scout its own
+# locations. The connection leaves out the DeathLink tag, so that it only receives what it asks for
+# (and broadcasts).
+class _SlotConnection:
+
+    def __init__(self, config: ADOSConfig, slot: SlotInfo, cache: "ScoutCache"):
+        self.slot = slot
+        self.locations: set[int] = set()  # Every location of the slot, once connected
+        self.last_used = time.monotonic()
+        self._cache = cache
+        self._lock = asyncio.Lock()
+        self._socket = SocketClient(config, slot_name=slot.name, game="Archipelago", fetch_data=False, death_link=False)
+        self._socket.add_message_handler(ConnectedMessage, self._handle_connected)
+        self._socket.add_message_handler(LocationInfoMessage, self._handle_location_info)
+
+    # Connects if need be; once connected, the slot's locations are known
+    async def ensure_connected(self, server_url: str) -> None:
+        self.last_used = time.monotonic()
+        async with self._lock:
+            if not self._socket.connected:
+                await self._socket.connect(server_url)
+
+    async def send(self, frame: str) -> None:
+        self.last_used = time.monotonic()
+        await self._socket.send(frame)
+
+    async def close(self) -> None:
+        await self._socket.close()
+
+    async def _handle_connected(self, message: ConnectedMessage) -> None:
+        self.locations = message.locations
+
+    async def _handle_location_info(self, message: LocationInfoMessage) -> None:
+        self._cache.add(self.slot.id, message.scouts)
+
+
+# Caches the items placed at locations, keyed by (slot ID, location ID). Placements never change
+# within a seed, so each location only ever has to be scouted once, and results can be persisted
+# along with the rest of the server data. Lookups made close together are gathered into a single
+# LocationScouts request per slot, and lookups of a location which is already being scouted wait
+# for that request rather than making another. Requests go over a connection per slot, which is
+# opened on first use and closed again once it has been idle for a while. The server announces
+# these connections to every player, so they are only made when enabled in the config.
+class ScoutCache:
+
+    def __init__(self, config: ADOSConfig, socket: SocketClient):
+        self._config = config
+        self._enabled = config.scout_slot_connections
+        self._socket = socket  # The main connection, which the server URL is taken from
+        self._results: dict[tuple[int, int], ScoutInfo] = {}
+        self._pending: dict[tuple[int, int], asyncio.Future[Optional[ScoutInfo]]] = {}
+        self._queued: dict[int, list[int]] = {}  # Maps slot IDs to locations waiting for the next request
+        self._batches: dict[int, asyncio.Task[None]] = {}
+        self._connections: dict[int, _SlotConnection] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+        self._version = 0
+
+    # Incremented whenever new results are added
+    @property
+    def version(self) -> int:
+        return self._version
+
+    # Maps each of the given locations of a slot to the item placed there. Locations which do not
+    # belong to the slot are left out.
+    async def scout(self, slot: SlotInfo, location_ids: Iterable[int]) -> dict[int, ScoutInfo]:
+        waiting: list[asyncio.Future[Optional[ScoutInfo]]] = []
+        results: dict[int, ScoutInfo] = {}
+        for location_id in location_ids:
+            key = (slot.id, location_id)
+            cached = self._results.get(key)
+            if cached is not None:
+                results[location_id] = cached
+                continue
+            if not self._enabled:
+                raise ADOSError("Looking up locations is disabled (see `scout_slot_connections` in the config)")
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = asyncio.get_running_loop().create_future()
+                self._queued.setdefault(slot.id, []).append(location_id)
+            waiting.append(pending)
+
+        if slot.id in self._queued and slot.id not in self._batches:
+            self._batches[slot.id] = asyncio.create_task(self._send_batch(slot))
+        for scouted in await asyncio.gather(*(asyncio.shield(future) for future in waiting)):
+            if scouted is not None:
+                results[scouted.location_id] = scouted
+        return results
+
+    # Adds results, either from the server or loaded from elsewhere (e.g. a snapshot)
+    def add(self, slot_id: int, scouts: Iterable[ScoutInfo]) -> None:
+        for scouted in scouts:
+            self._results[(slot_id, scouted.location_id)] = scouted
+            self._resolve((slot_id, scouted.location_id), scouted)
+        self._version += 1
+
+    # Every result as (slot ID, location ID, item ID, receiver ID, flags), for persisting
+    def records(self) -> list[tuple[int, int, int, int, int]]:
+        return [(slot_id, *scouted) for (slot_id, _), scouted in self._results.items()]
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._close_idle())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for batch in self._batches.values():
+            batch.cancel()
+        for connection in self._connections.values():
+            await connection.close()
+        self._connections = {}
+
+    # Sends every location queued for a slot since the first of them was, once the batch delay is
+    # up. Lookups which are not answered within the timeout (or cannot be sent at all) fail.
+    async def _send_batch(self, slot: SlotInfo) -> None:
+        await asyncio.sleep(SCOUT_BATCH_DELAY)
+        del self._batches[slot.id]
+        location_ids = self._queued.pop(slot.id)
+        error: ADOSError
+        try:
+            connection = await self._connection(slot)
+
+            # The server rejects a whole request if any location in it is not the slot's own
+            for location_id in location_ids:
+                if location_id not in connection.locations:
+                    self._resolve((slot.id, location_id), None)
+            location_ids = [location_id for location_id in location_ids if location_id in connection.locations]
+            for start in range(0, len(location_ids), SCOUT_BATCH_SIZE):
+                await connection.send(location_scouts_message(location_ids[start : start + SCOUT_BATCH_SIZE]))
+            _log.debug("Scouting %d location(s) for slot '%s'", len(location_ids), slot)
+
+            keys = [(slot.id, location_id) for location_id in location_ids]
+            waiting = [self._pending[key] for key in keys if key in self._pending]
+            if waiting:
+                await asyncio.wait(waiting, timeout=SCOUT_TIMEOUT)
+            error = ADOSError(f"Timed out scouting locations for slot `{slot}`")
+        except ADOSError as ex:
+            error = ex
+        except Exception as ex:
+            _log.error("Failed to scout locations for slot '%s': %s", slot, ex)
+            error = ADOSError(f"Failed to scout locations for slot `{slot}`")
+        for location_id in location_ids:
+            pending = self._pending.pop((slot.id, location_id), None)
+            if pending is not None and not pending.done():
+                pending.set_exception(error)
+
+    async def _connection(self, slot: SlotInfo) -> _SlotConnection:
+        server_url = self._socket.server_url
+        if server_url is None:
+            raise ADOSError("Not connected to the Archipelago server")
+        connection = self._connections.get(slot.id)
+        if connection is None:
+            connection = self._connections[slot.id] = _SlotConnection(self._config, slot, self)
+        await connection.ensure_connected(server_url)
+        return connection
+
+    def _resolve(self, key: tuple[int, int], scouted: Optional[ScoutInfo]) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is not None and not pending.done():
+            pending.set_result(scouted)
+
+    async def _close_idle(self) -> None:
+        while True:
+            await asyncio.sleep(SCOUT_IDLE_TIMEOUT / 2)
+            now = time.monotonic()
+            for slot_id, connection in list(self._connections.items()):
+                if now - connection.last_used >= SCOUT_IDLE_TIMEOUT and slot_id not in self._batches:
+                    del self._connections[slot_id]
+                    await connection.close()
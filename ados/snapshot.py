@@ -0,0 +1,218 @@
+import mmap
+import os
+import struct
+from typing import Any, Iterator, NamedTuple, Self
+
+from ados.common import GameTable, SlotInfo
+
+# Snapshot file layout (all integers little-endian):
+#   - Header: magic, format version, section count
+#   - Section table: one (name, offset, size) entry per section
+#   - Sections: "strings" holds UTF-8 text, referred to by (offset, length) pairs; "slots" and
+#     "games" are packed arrays of fixed-size records; "ids" is a packed array of 64-bit ids;
+#     "checks" and "scouts" are packed arrays of fixed-size records (and are optional)
+# Each game record points at the ids of its items and locations, and at their names, which are
+# stored as one NUL-separated string per table. Slots and the game index can therefore be read
+# straight out of a memory map without touching the (much larger) item and location tables, which
+# are decoded one game at a time, a whole column at once. Readers skip sections they do not know,
+# so sections can be added without bumping the format version.
+MAGIC = b"ADOSSNAP"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sII")
+SECTION_ENTRY = struct.Struct("<16sQQ")
+SLOT_RECORD = struct.Struct("<qIIIIII")  # id, then (offset, length) of name, alias, and game
+GAME_RECORD = struct.Struct("<IIQIIIQIII")  # game name, then per table: first id, entries, names
+CHECK_RECORD = struct.Struct("<qq")  # slot id, location id
+SCOUT_RECORD = struct.Struct("<qqqqq")  # slot id, location id, item id, receiving slot id, item flags
+ID_SIZE = 8
+
+STRINGS_SECTION = "strings"
+SLOTS_SECTION = "slots"
+GAMES_SECTION = "games"
+IDS_SECTION = "ids"
+CHECKS_SECTION = "checks"
+SCOUTS_SECTION = "scouts"
+NAME_SEPARATOR = "\0"
+EMPTY_TABLE = GameTable((), [])
+
+
+# Everything held in a snapshot. Item and location tables are keyed by game, as in the data package.
+class SnapshotData(NamedTuple):
+    slots: list[SlotInfo]
+    game_items: dict[str, GameTable]
+    game_locations: dict[str, GameTable]
+    checks: dict[int, set[int]]  # Maps slot IDs to checked location IDs
+    scouts: list[tuple[int, int, int, int, int]]  # Items found by scouting locations
+
+
+# Location of a single item or location table within the snapshot
+class _TableIndex(NamedTuple):
+    first_id: int
+    entries: int
+    names_offset: int
+    names_length: int
+
+
+class _Writer:
+
+    def __init__(self) -> None:
+        self._string_offsets: dict[str, tuple[int, int]] = {}
+        self.strings = bytearray()
+        self.ids = bytearray()
+
+    # Adds a string to the string table, storing each distinct string only once
+    def string(self, value: str) -> tuple[int, int]:
+        location = self._string_offsets.get(value)
+        if location is None:
+            encoded = value.encode("utf-8")
+            location = self._string_offsets[value] = (len(self.strings), len(encoded))
+            self.strings += encoded
+        return location
+
+    def table(self, table: GameTable) -> _TableIndex:
+        first_id = len(self.ids) // ID_SIZE
+        self.ids += struct.pack(f"<{len(table.ids)}q", *table.ids)
+        names = NAME_SEPARATOR.join(table.names).encode("utf-8")
+        names_offset = len(self.strings)
+        self.strings += names
+        return _TableIndex(first_id, len(table.ids), names_offset, len(names))
+
+
+# Writes a snapshot, replacing any existing file atomically so that readers (and a crash
+# mid-write) never see a partial file
+def write_snapshot(path: str, snapshot: SnapshotData) -> None:
+    writer = _Writer()
+    slots = b"".join(
+        SLOT_RECORD.pack(slot.id, *writer.string(slot.name), *writer.string(slot.alias), *writer.string(slot.game))
+        for slot in snapshot.slots
+    )
+    games = b"".join(
+        GAME_RECORD.pack(
+            *writer.string(game),
+            *writer.table(snapshot.game_items.get(game, EMPTY_TABLE)),
+            *writer.table(snapshot.game_locations.get(game, EMPTY_TABLE)),
+        )
+        for game in snapshot.game_items.keys() | snapshot.game_locations.keys()
+    )
+    checks = b"".join(
+        CHECK_RECORD.pack(slot_id, location_id)
+        for slot_id, slot_checks in snapshot.checks.items()
+        for location_id in slot_checks
+    )
+    scouts = b"".join(SCOUT_RECORD.pack(*record) for record in snapshot.scouts)
+    sections = {
+        SLOTS_SECTION: slots,
+        GAMES_SECTION: games,
+        IDS_SECTION: bytes(writer.ids),
+        CHECKS_SECTION: checks,
+        SCOUTS_SECTION: scouts,
+        STRINGS_SECTION: bytes(writer.strings),
+    }
+
+    offset = HEADER.size + SECTION_ENTRY.size * len(sections)
+    table: list[bytes] = []
+    for name, data in sections.items():
+        table.append(SECTION_ENTRY.pack(name.encode("ascii"), offset, len(data)))
+        offset += len(data)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(sections)))
+        snapshot_file.writelines(table)
+        snapshot_file.writelines(sections.values())
+    os.replace(temp_path, path)
+
+
+# Reads a snapshot written by write_snapshot from a memory map. Opening only reads the header,
+# slots, and game index; item and location tables (as well as checks and scouts) are decoded on
+# request. Raises ValueError if the file is not a valid snapshot.
+class SnapshotReader:
+
+    def __init__(self, path: str):
+        with open(path, "rb") as snapshot_file:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._sections = self._read_sections()
+            self._strings_offset = self._sections[STRINGS_SECTION][0]
+            self._ids_offset = self._sections[IDS_SECTION][0]
+
+            self.slots: list[SlotInfo] = []
+            for slot_id, *strings in self._records(SLOTS_SECTION, SLOT_RECORD):
+                name, alias, game = (self._string(strings[index], strings[index + 1]) for index in range(0, 6, 2))
+                self.slots.append(SlotInfo(id=slot_id, name=name, alias=alias, game=game))
+
+            self._games: dict[str, tuple[_TableIndex, _TableIndex]] = {}
+            for name_offset, name_length, *tables in self._records(GAMES_SECTION, GAME_RECORD):
+                game = self._string(name_offset, name_length)
+                self._games[game] = (_TableIndex(*tables[:4]), _TableIndex(*tables[4:]))
+        except Exception:
+            self._map.close()
+            raise
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+
+    @property
+    def games(self) -> list[str]:
+        return list(self._games)
+
+    def game_items(self, game: str) -> GameTable:
+        return self._table(self._games[game][0])
+
+    def game_locations(self, game: str) -> GameTable:
+        return self._table(self._games[game][1])
+
+    def checks(self) -> dict[int, set[int]]:
+        checks: dict[int, set[int]] = {}
+        if CHECKS_SECTION in self._sections:
+            for slot_id, location_id in self._records(CHECKS_SECTION, CHECK_RECORD):
+                checks.setdefault(slot_id, set()).add(location_id)
+        return checks
+
+    def scouts(self) -> list[tuple[int, int, int, int, int]]:
+        if SCOUTS_SECTION not in self._sections:
+            return []
+        return list(self._records(SCOUTS_SECTION, SCOUT_RECORD))
+
+    def _read_sections(self) -> dict[str, tuple[int, int]]:
+        if len(self._map) < HEADER.size:
+            raise ValueError("File is too short to be a snapshot")
+        magic, version, section_count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format (version {version})")
+
+        sections: dict[str, tuple[int, int]] = {}
+        for index in range(section_count):
+            name, offset, size = SECTION_ENTRY.unpack_from(self._map, HEADER.size + index * SECTION_ENTRY.size)
+            if offset + size > len(self._map):
+                raise ValueError("Snapshot section extends past the end of the file")
+            sections[name.rstrip(b"\0").decode("ascii")] = (offset, size)
+        if any(name not in sections for name in (STRINGS_SECTION, SLOTS_SECTION, GAMES_SECTION, IDS_SECTION)):
+            raise ValueError("Snapshot is missing required sections")
+        return sections
+
+    def _records(self, name: str, record: struct.Struct) -> Iterator[tuple[Any, ...]]:
+        offset, size = self._sections[name]
+        if size % record.size:
+            raise ValueError(f"Snapshot section '{name}' has a partial record")
+        return record.iter_unpack(self._map[offset : offset + size])
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return self._map[start : start + length].decode("utf-8")
+
+    def _table(self, index: _TableIndex) -> GameTable:
+        if index.entries == 0:
+            return GameTable((), [])
+        ids = struct.unpack_from(f"<{index.entries}q", self._map, self._ids_offset + index.first_id * ID_SIZE)
+        names = self._string(index.names_offset, index.names_length).split(NAME_SEPARATOR)
+        if len(names) != index.entries:
+            raise ValueError("Snapshot table has mismatched ids and names")
+        return GameTable(ids, names)
@@ -1,16 +1,46 @@
+import asyncio
 import json
 import logging
 import os
+import time
 from collections import defaultdict
 from datetime import datetime
-from typing import Any, Callable, DefaultDict, Self
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Iterable,
+    Iterator,
+    Optional,
+    Self,
+)
 
 from pydantic import BaseModel
 
-from ados.arch.messages import ConnectedMessage, DataPackageMessage, RoomUpdateMessage
+from ados.arch.messages import (
+    ConnectedMessage,
+    DataPackageMessage,
+    DeathLinkMessage,
+    ItemSendMessage,
+    RoomUpdateMessage,
+)
 from ados.arch.socket import SocketClient
-from ados.common import ADOSError, ItemInfo, LocationInfo, SlotInfo
+from ados.common import (
+    ADOSError,
+    DeathInfo,
+    GameTable,
+    ItemInfo,
+    ItemLevel,
+    LocationInfo,
+    ScoutInfo,
+    SlotInfo,
+)
 from ados.config import ADOSConfig
+from ados.items import ALL_LEVELS, ItemHistory, ReceivedItem
+from ados.metrics import STATE_PERSIST_SECONDS
+from ados.scouts import ScoutCache
+from ados.snapshot import EMPTY_TABLE, SnapshotData, SnapshotReader, write_snapshot
+from ados.timeseries import CHECKS_METRIC, DEATHS_METRIC, TimeSeries, TimeSeriesStore
 
 _log = logging.getLogger(__name__)
 
@@ -18,12 +48,15 @@ _log = logging.getLogger(__name__)
 # The actual data stored in the state file
 class StateData(BaseModel):
     user_slots: DefaultDict[int, set[int]] = defaultdict(set)  # Maps Discord user IDs to slot IDs
+    deaths: DefaultDict[int, int] = defaultdict(int)  # Maps slot IDs to DeathLink deaths
+    replayed: dict[int, dict[int, int]] = {}  # Maps Discord user IDs to the number of items replayed per slot
 
 
 # The main ArchipelaDOS state management class. Handles information related to user state,
 # like registered slots and item subscriptions, and ensures this information is persisted
 # so that it is not lost on bot restarts. Also handles information fetched from the server,
-# such as slot details and item mappings.
+# such as slot details and item mappings. The server information is also periodically written to a
+# binary snapshot, so that it is available immediately after a restart.
 class ADOSState:
 
     # Decorator which will persist the state after the method is called
@@ -41,37 +74,190 @@ class ADOSState:
         self._file_path = os.path.join(config.data_path, f"{config.archipelago_room}_state.json")
 
         self._slots_by_id: dict[int, SlotInfo] = {}
-        self._slots_by_name: dict[str, SlotInfo] = {}
+        self._slots_by_name: dict[str, SlotInfo] = {}  # Keyed by lowercased name, alias, and both combined
+        self._slot_keys: dict[str, dict[int, int]] = {}  # Maps the same keys to every slot ID using them, by priority
+        self._slots_version = 0
 
+        self._checks: dict[int, set[int]] = {}  # Maps slot IDs to checked location IDs
+        self._checks_version = 0
+        self._deaths_version = 0
+        self._received = ItemHistory(os.path.join(config.data_path, f"{config.archipelago_room}_received.bin"))
+        self._scouts = ScoutCache(config, socket)
+        self._timeseries = TimeSeriesStore(config)
+
+        # Tables are kept as received; the lookups for a game are only built from them when first used
+        self._game_items: dict[str, GameTable] = {}
+        self._game_locations: dict[str, GameTable] = {}
         self._game_items_by_id: dict[str, dict[int, ItemInfo]] = {}
         self._game_items_by_name: dict[str, dict[str, ItemInfo]] = {}
         self._game_locations_by_id: dict[str, dict[int, LocationInfo]] = {}
         self._game_locations_by_name: dict[str, dict[str, LocationInfo]] = {}
 
         self._data = self._load_state()
+        self._reset_stale_replays()
         self._save_state()
 
-        socket.add_message_handler(ConnectedMessage, self._handle_slot_update)
-        socket.add_message_handler(RoomUpdateMessage, self._handle_slot_update)
+        self._snapshot_path = os.path.join(config.data_path, f"{config.archipelago_room}_snapshot.bin")
+        self._snapshot_interval = config.snapshot_interval
+        self._snapshot_task: Optional[asyncio.Task[None]] = None
+        self._snapshot_dirty = False
+        self._snapshot_reader: Optional[SnapshotReader] = None
+        self._snapshot_games: set[str] = set()  # Games taken from the snapshot and not yet refreshed
+        if self._snapshot_interval is not None:
+            self._load_snapshot()
+
+        socket.add_message_handler(ConnectedMessage, self._handle_connected)
+        socket.add_message_handler(RoomUpdateMessage, self._handle_room_update)
         socket.add_message_handler(DataPackageMessage, self._handle_data_package)
+        socket.add_message_handler(ItemSendMessage, self._handle_item_send)
+        socket.add_message_handler(DeathLinkMessage, self._handle_death_link)
+
+    async def _handle_connected(self, message: ConnectedMessage) -> None:
+        self._set_slots(message.slots)
+        self._snapshot_dirty = True
+
+        # Anything loaded from the snapshot for games which are no longer part of the room is stale
+        stale_games = self._snapshot_games - {slot.game for slot in message.slots}
+        for game in stale_games:
+            self._game_items.pop(game, None)
+            self._game_locations.pop(game, None)
+            self._clear_game_lookups(game)
+        self._snapshot_games -= stale_games
 
-    async def _handle_slot_update(self, message: ConnectedMessage | RoomUpdateMessage) -> None:
-        self._slots_by_id = {slot.id: slot for slot in message.slots}
-        self._slots_by_name = {slot.name.lower(): slot for slot in message.slots}
-        self._slots_by_name.update({slot.alias.lower(): slot for slot in message.slots})
-        self._slots_by_name.update({str(slot): slot for slot in message.slots})
+    # Room updates list every player, so they are applied as a diff: only slots whose alias
+    # actually changed are re-indexed (and bump slots_version, which anything cached by slot name
+    # is keyed on)
+    async def _handle_room_update(self, message: RoomUpdateMessage) -> None:
+        changes: list[tuple[SlotInfo, SlotInfo]] = []
+        for slot_id, alias in message.aliases.items():
+            slot = self._slots_by_id.get(slot_id)
+            if slot is None or slot.alias == alias:
+                continue
+            updated = SlotInfo(id=slot.id, name=slot.name, alias=alias, game=slot.game)
+            self._unindex_slot(slot)
+            self._index_slot(updated)
+            changes.append((slot, updated))
+        if not changes:
+            return
+
+        self._slots_version += 1
+        self._snapshot_dirty = True
+        for old_slot, new_slot in changes:
+            _log.info("Slot '%s' is now known as '%s'", old_slot, new_slot)
 
     async def _handle_data_package(self, message: DataPackageMessage) -> None:
-        for game, items in message.game_items.items():
-            self._game_items_by_id[game] = {item.id: item for item in items}
+        self._set_game_tables(message.game_items, message.game_locations)
+        self._snapshot_games -= message.game_items.keys() | message.game_locations.keys()
+        self._snapshot_dirty = True
+
+    # Every item sent is added to the receiving slot's history. An item sent from a location also
+    # means that location was checked by the sending slot.
+    async def _handle_item_send(self, message: ItemSendMessage) -> None:
+        self._received.add(message.receiver_id, message.item_id, message.sender_id, message.location_id, message.flags)
+        if message.location_id < 0:
+            return
+        slot_checks = self._checks.setdefault(message.sender_id, set())
+        if message.location_id not in slot_checks:
+            slot_checks.add(message.location_id)
+            self._timeseries.record(CHECKS_METRIC, message.sender_id)
+            self._checks_version += 1
+            self._snapshot_dirty = True
+
+    async def _handle_death_link(self, message: DeathLinkMessage) -> None:
+        self._record_deaths(message.deaths)
+
+    # A cascade of deaths received together is counted in one update, and persisted once
+    @persist
+    def _record_deaths(self, deaths: list[DeathInfo]) -> None:
+        for death in deaths:
+            slot = self._slots_by_name.get(death.source.lower())
+            if slot is None:
+                _log.warning("Received DeathLink from unknown slot '%s'", death.source)
+                continue
+            self._data.deaths[slot.id] += 1
+            self._timeseries.record(DEATHS_METRIC, slot.id, timestamp=death.time)
+        self._deaths_version += 1
+
+    def _set_slots(self, slots: list[SlotInfo]) -> None:
+        self._slots_by_id = {slot.id: slot for slot in slots}
+        self._slots_by_name = {}
+        self._slot_keys = {}
+        for slot in slots:
+            self._index_slot(slot)
+        self._slots_version += 1
+
+    # The keys a slot can be looked up by, with their priority when several slots share a key: names
+    # lose to aliases, which lose to combined keys. Ties go to the slot with the highest ID. A key
+    # which is also the slot's own name (as all of them are, for a slot without an alias) only
+    # counts as a name.
+    @staticmethod
+    def _slot_key_priorities(slot: SlotInfo) -> dict[str, int]:
+        return {str(slot).lower(): 2, slot.alias.lower(): 1, slot.name.lower(): 0}
+
+    def _index_slot(self, slot: SlotInfo) -> None:
+        self._slots_by_id[slot.id] = slot
+        for key, priority in self._slot_key_priorities(slot).items():
+            self._slot_keys.setdefault(key, {})[slot.id] = priority
+            self._update_slot_key(key)
+
+    # Removes every key of a slot. A key shared with other slots is handed to whichever of them
+    # has the best claim on it, so aliases cannot hide a name (or another alias) for longer than
+    # they are in use.
+    def _unindex_slot(self, slot: SlotInfo) -> None:
+        for key in self._slot_key_priorities(slot):
+            owners = self._slot_keys[key]
+            del owners[slot.id]
+            if not owners:
+                del self._slot_keys[key]
+            self._update_slot_key(key)
+
+    def _update_slot_key(self, key: str) -> None:
+        owners = self._slot_keys.get(key)
+        if not owners:
+            self._slots_by_name.pop(key, None)
+            return
+        owner_id = max(owners, key=lambda slot_id: (owners[slot_id], slot_id))
+        self._slots_by_name[key] = self._slots_by_id[owner_id]
+
+    def _set_game_tables(self, game_items: dict[str, GameTable], game_locations: dict[str, GameTable]) -> None:
+        self._game_items.update(game_items)
+        self._game_locations.update(game_locations)
+        for game in game_items.keys() | game_locations.keys():
+            self._clear_game_lookups(game)
+
+    def _clear_game_lookups(self, game: str) -> None:
+        self._game_items_by_id.pop(game, None)
+        self._game_items_by_name.pop(game, None)
+        self._game_locations_by_id.pop(game, None)
+        self._game_locations_by_name.pop(game, None)
+
+    # Builds the item lookups of a game from its table, the first time any item in it is looked up
+    def _item_lookup(self, game: str) -> dict[int, ItemInfo]:
+        items_by_id = self._game_items_by_id.get(game)
+        if items_by_id is None:
+            table = self._game_items.get(game, EMPTY_TABLE)
+            items = [ItemInfo(id=item_id, name=name, game=game) for item_id, name in zip(table.ids, table.names)]
+            items_by_id = self._game_items_by_id[game] = {item.id: item for item in items}
             self._game_items_by_name[game] = {item.name.lower(): item for item in items}
-        for game, locations in message.game_locations.items():
-            self._game_locations_by_id[game] = {location.id: location for location in locations}
+        return items_by_id
+
+    # As _item_lookup, but for locations
+    def _location_lookup(self, game: str) -> dict[int, LocationInfo]:
+        locations_by_id = self._game_locations_by_id.get(game)
+        if locations_by_id is None:
+            table = self._game_locations.get(game, EMPTY_TABLE)
+            locations = [
+                LocationInfo(id=location_id, name=name, game=game) for location_id, name in zip(table.ids, table.names)
+            ]
+            locations_by_id = self._game_locations_by_id[game] = {location.id: location for location in locations}
             self._game_locations_by_name[game] = {location.name.lower(): location for location in locations}
+        return locations_by_id
 
     def _save_state(self) -> None:
+        start = time.perf_counter()
         with open(self._file_path, "w") as data_file:
             data_file.write(self._data.model_dump_json(indent=4))
+        STATE_PERSIST_SECONDS.observe(time.perf_counter() - start)
 
     def _load_state(self) -> StateData:
         # If the file doesn't exist, return a fresh state
@@ -94,10 +280,194 @@ class ADOSState:
             _log.info("Backed up invalid state file to '%s'; starting fresh", backup_path)
             return StateData()
 
+    ################################################
+    ################## SNAPSHOTS ###################
+    ################################################
+
+    # Starts time series maintenance, scout connection upkeep, loading the rest of the snapshot,
+    # and writing snapshots periodically (when enabled)
+    async def start(self) -> None:
+        await self._timeseries.start()
+        await self._scouts.start()
+        if self._snapshot_interval is not None and self._snapshot_task is None:
+            self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+
+    # Stops the periodic snapshots, and writes a final one if anything changed since the last.
+    # Also writes out any buffered time series events, and closes scout connections.
+    async def stop(self) -> None:
+        await self._scouts.stop()
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        if self._snapshot_interval is not None and self._snapshot_dirty:
+            self._snapshot_dirty = False
+            try:
+                write_snapshot(self._snapshot_path, self._snapshot_data())
+            except Exception as ex:
+                _log.error("Failed to write snapshot file '%s': %s", self._snapshot_path, ex)
+        self._close_snapshot()
+        await self._timeseries.stop()
+
+    async def _snapshot_loop(self) -> None:
+        assert self._snapshot_interval is not None
+        await self._load_snapshot_tables()
+        while True:
+            await asyncio.sleep(self._snapshot_interval)
+            if not self._snapshot_dirty:
+                continue
+
+            # Only gathering the data has to happen on the event loop; encoding and writing do not
+            self._snapshot_dirty = False
+            try:
+                await asyncio.to_thread(write_snapshot, self._snapshot_path, self._snapshot_data())
+                _log.debug("Wrote snapshot file '%s'", self._snapshot_path)
+            except Exception as ex:
+                _log.error("Failed to write snapshot file '%s': %s", self._snapshot_path, ex)
+                self._snapshot_dirty = True
+
+    def _snapshot_data(self) -> SnapshotData:
+        game_items = dict(self._game_items)
+        game_locations = dict(self._game_locations)
+
+        checks = {slot_id: set(slot_checks) for slot_id, slot_checks in self._checks.items()}
+        scouts = self._scouts.records()
+
+        # Anything still waiting in the previous snapshot has to be carried over to the next one
+        if self._snapshot_reader is not None:
+            for game in self._snapshot_games:
+                game_items[game] = self._snapshot_reader.game_items(game)
+                game_locations[game] = self._snapshot_reader.game_locations(game)
+            for slot_id, slot_checks in self._snapshot_reader.checks().items():
+                checks.setdefault(slot_id, set()).update(slot_checks)
+            scouts = self._snapshot_reader.scouts() + scouts
+        slots = list(self._slots_by_id.values())
+        return SnapshotData(slots, game_items, game_locations, checks, scouts)
+
+    # Only the slots are read from the snapshot at startup, which is fast regardless of the size
+    # of the data package, and is all that commands need to work
+    def _load_snapshot(self) -> None:
+        if not os.path.exists(self._snapshot_path):
+            _log.info("Snapshot file '%s' does not exist; waiting for server data", self._snapshot_path)
+            return
+
+        start = time.perf_counter()
+        try:
+            self._snapshot_reader = SnapshotReader(self._snapshot_path)
+        except Exception as ex:
+            # The snapshot only holds data that will be fetched from the server again anyway
+            _log.error("Failed to load snapshot file '%s': %s", self._snapshot_path, ex)
+            return
+
+        self._set_slots(self._snapshot_reader.slots)
+        self._snapshot_games = set(self._snapshot_reader.games)
+        _log.info(
+            "Loaded snapshot file '%s' with %d slots in %.1f ms",
+            self._snapshot_path,
+            len(self._snapshot_reader.slots),
+            (time.perf_counter() - start) * 1000,
+        )
+
+    # Item and location tables (and checks and scouts) are decoded off the event loop once
+    # the bot starts.
+    # Games which the server has sent in the meantime are skipped, since the live data is newer.
+    async def _load_snapshot_tables(self) -> None:
+        reader = self._snapshot_reader
+        if reader is None:
+            return
+
+        games = list(self._snapshot_games)
+
+        def _read_tables() -> SnapshotData:
+            return SnapshotData(
+                [],
+                {game: reader.game_items(game) for game in games},
+                {game: reader.game_locations(game) for game in games},
+                reader.checks(),
+                reader.scouts(),
+            )
+
+        start = time.perf_counter()
+        try:
+            tables = await asyncio.to_thread(_read_tables)
+        except Exception as ex:
+            _log.error("Failed to load tables from snapshot file '%s': %s", self._snapshot_path, ex)
+            self._snapshot_games = set()
+            self._close_snapshot()
+            return
+
+        self._set_game_tables(
+            {game: items for game, items in tables.game_items.items() if game in self._snapshot_games},
+            {game: locations for game, locations in tables.game_locations.items() if game in self._snapshot_games},
+        )
+        for slot_id, slot_checks in tables.checks.items():
+            self._checks.setdefault(slot_id, set()).update(slot_checks)
+        self._checks_version += 1
+        for slot_id, *scouted in tables.scouts:
+            self._scouts.add(slot_id, [ScoutInfo(*scouted)])
+        self._close_snapshot()
+        _log.info(
+            "Loaded %d game tables from snapshot file '%s' in %.1f ms",
+            len(self._snapshot_games),
+            self._snapshot_path,
+            (time.perf_counter() - start) * 1000,
+        )
+
+    def _close_snapshot(self) -> None:
+        if self._snapshot_reader is not None:
+            self._snapshot_reader.close()
+            self._snapshot_reader = None
+
     ################################################
     ################# SERVER DATA ##################
     ################################################
 
+    # Incremented whenever the slot details change, so that anything derived from them (such as
+    # rendered command responses) can tell when it is out of date
+    @property
+    def slots_version(self) -> int:
+        return self._slots_version
+
+    # Incremented whenever a location is checked
+    @property
+    def checks_version(self) -> int:
+        return self._checks_version
+
+    # Maps slot IDs to the number of locations they have checked
+    def check_counts(self) -> dict[int, int]:
+        return {slot_id: len(slot_checks) for slot_id, slot_checks in self._checks.items()}
+
+    # Incremented whenever deaths are recorded
+    @property
+    def deaths_version(self) -> int:
+        return self._deaths_version
+
+    # Maps slot IDs to the number of DeathLink deaths they have triggered
+    def death_counts(self) -> dict[int, int]:
+        return dict(self._data.deaths)
+
+    # Cumulative counts of a time series metric (CHECKS_METRIC or DEATHS_METRIC) per slot ID, since 'start'
+    # or the beginning of the game
+    async def history(self, metric: str, start: Optional[float] = None) -> dict[int, TimeSeries]:
+        return await self._timeseries.query(metric, start)
+
+    def slot_by_id(self, slot_id: int) -> Optional[SlotInfo]:
+        return self._slots_by_id.get(slot_id)
+
+    def item_by_id(self, game: str, item_id: int) -> Optional[ItemInfo]:
+        return self._item_lookup(game).get(item_id)
+
+    def location_by_id(self, game: str, location_id: int) -> Optional[LocationInfo]:
+        return self._location_lookup(game).get(location_id)
+
+    # Maps each of the given locations of a slot to the item placed there, scouting any which have
+    # not been scouted before. Locations which do not belong to the slot are left out.
+    async def scout_locations(self, slot: SlotInfo, location_ids: Iterable[int]) -> dict[int, ScoutInfo]:
+        version = self._scouts.version
+        scouts = await self._scouts.scout(slot, location_ids)
+        if self._scouts.version != version:
+            self._snapshot_dirty = True
+        return scouts
+
     def all_slots(self) -> list[SlotInfo]:
         return list(self._slots_by_id.values())
 
@@ -111,9 +481,13 @@ class ADOSState:
     ############## SLOT REGISTRATIONS ##############
     ################################################
 
+    # Registrations are loaded from the state file, so they can be known before the slots are (with
+    # no snapshot, until the server connection is up). Slots no longer in the room are left out.
     def user_slots(self, user_id: int) -> list[SlotInfo]:
         slot_ids = self._data.user_slots.get(user_id, set())
-        return [self._slots_by_id[slot_id] for slot_id in slot_ids]
+        if slot_ids and not self._slots_by_id:
+            raise ADOSError("Not connected to the Archipelago room yet")
+        return [self._slots_by_id[slot_id] for slot_id in slot_ids if slot_id in self._slots_by_id]
 
     @persist
     def add_user_slot(self, user_id: int, slot: SlotInfo) -> None:
@@ -133,3 +507,35 @@ class ADOSState:
     def clear_user_slots(self, user_id: int) -> None:
         if user_id in self._data.user_slots:
             self._data.user_slots.pop(user_id)
+
+    ################################################
+    ################ RECEIVED ITEMS ################
+    ################################################
+
+    # Items received by a slot with any of the given levels, optionally only those the user has not
+    # had replayed yet. Items are produced lazily, in the order they were received.
+    def received_items(
+        self, slot_id: int, levels: ItemLevel = ALL_LEVELS, *, unreplayed_by: Optional[int] = None
+    ) -> Iterator[ReceivedItem]:
+        start = 0 if unreplayed_by is None else self._data.replayed.get(unreplayed_by, {}).get(slot_id, 0)
+        return self._received.query(slot_id, levels, start)
+
+    # Replay positions past the end of the received history (e.g. if its file was lost) no longer
+    # refer to anything, so they start over rather than skipping whatever the slot receives next
+    def _reset_stale_replays(self) -> None:
+        for user_id, positions in self._data.replayed.items():
+            for slot_id, position in positions.items():
+                if position > self._received.count(slot_id):
+                    _log.warning(
+                        "Resetting replay position of user %d for slot %d past received history", user_id, slot_id
+                    )
+                    positions[slot_id] = 0
+
+    # Marks items as replayed for the user, up to the given position (of the next item to replay)
+    # for each slot ID. Positions never move backwards, since two replays may be paged through
+    # at once.
+    @persist
+    def mark_replayed(self, user_id: int, positions: dict[int, int]) -> None:
+        replayed = self._data.replayed.setdefault(user_id, {})
+        for slot_id, position in positions.items():
+            replayed[slot_id] = max(replayed.get(slot_id, 0), position)
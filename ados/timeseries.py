@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from ados.config import ADOSConfig
+
+_log = logging.getLogger(__name__)
+
+CHECKS_METRIC = "checks"
+DEATHS_METRIC = "deaths"
+
+HOUR = 3600
+DAY = 24 * HOUR
+FLUSH_INTERVAL = 5.0
+COMPACT_INTERVAL = 600.0
+
+# Each tier covers a separate span of time: raw events are the most recent, then hourly buckets,
+# then daily buckets. Compaction moves data from one tier into the next on bucket boundaries,
+# so the tiers never overlap and the total count of a metric is the sum over all of them.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw (metric TEXT NOT NULL, slot INTEGER NOT NULL, time REAL NOT NULL, count INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS raw_metric_time ON raw (metric, time);
+CREATE TABLE IF NOT EXISTS hourly (
+    metric TEXT NOT NULL, slot INTEGER NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL,
+    PRIMARY KEY (metric, slot, bucket)
+);
+CREATE TABLE IF NOT EXISTS daily (
+    metric TEXT NOT NULL, slot INTEGER NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL,
+    PRIMARY KEY (metric, slot, bucket)
+);
+"""
+
+# Bucketed rows are reported at the end of their bucket, i.e. the time by which the counts had
+# been reached
+TIERS_QUERY = """
+SELECT slot, time, count FROM raw WHERE metric = :metric
+UNION ALL SELECT slot, bucket + 3600, count FROM hourly WHERE metric = :metric
+UNION ALL SELECT slot, bucket + 86400, count FROM daily WHERE metric = :metric
+"""
+
+COMPACT_STATEMENTS = (
+    """
+    INSERT INTO hourly (metric, slot, bucket, count)
+    SELECT metric, slot, CAST(time / 3600 AS INTEGER) * 3600, SUM(count) FROM raw WHERE time < :raw_cutoff
+    GROUP BY 1, 2, 3
+    ON CONFLICT (metric, slot, bucket) DO UPDATE SET count = count + excluded.count
+    """,
+    "DELETE FROM raw WHERE time < :raw_cutoff",
+    """
+    INSERT INTO daily (metric, slot, bucket, count)
+    SELECT metric, slot, bucket / 86400 * 86400, SUM(count) FROM hourly WHERE bucket < :hourly_cutoff
+    GROUP BY 1, 2, 3
+    ON CONFLICT (metric, slot, bucket) DO UPDATE SET count = count + excluded.count
+    """,
+    "DELETE FROM hourly WHERE bucket < :hourly_cutoff",
+)
+
+# A series of (time, cumulative count) points for one slot
+type TimeSeries = list[tuple[float, int]]
+
+
+# Stores per-slot event counts over time (such as checks and deaths) in an SQLite database in
+# the data directory. Recent events are kept at full resolution; older ones are periodically
+# rolled up into hourly and then daily counts, so the size of the database (and of any query
+# result) stays bounded however long the game runs. Recording an event only appends it to an
+# in-memory buffer; writes, compaction, and queries all run on a dedicated database thread.
+class TimeSeriesStore:
+
+    def __init__(self, config: ADOSConfig):
+        os.makedirs(config.data_path, exist_ok=True)
+        self._file_path = os.path.join(config.data_path, f"{config.archipelago_room}_timeseries.db")
+        self._raw_retention = config.timeseries_raw_hours * HOUR
+        self._hourly_retention = config.timeseries_hourly_days * DAY
+
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="ados-timeseries")
+        self._connection = sqlite3.connect(self._file_path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        self._pending: list[tuple[str, int, float, int]] = []
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def record(self, metric: str, slot_id: int, count: int = 1, timestamp: Optional[float] = None) -> None:
+        self._pending.append((metric, slot_id, time.time() if timestamp is None else timestamp, count))
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._run(self._flush, self._take_pending())
+        await self._run(self._connection.close)
+        self._executor.shutdown()
+
+    # Returns cumulative counts per slot ID, from 'start' (or the beginning of the game) until now.
+    # Each series starts with the count reached by 'start', so it can be plotted directly.
+    async def query(self, metric: str, start: Optional[float] = None) -> dict[int, TimeSeries]:
+        await self._run(self._flush, self._take_pending())
+        return await self._run(self._query, metric, start)
+
+    # Rolls old data up into the coarser tiers; this also happens periodically while running
+    async def compact(self) -> None:
+        await self._run(self._flush, self._take_pending())
+        await self._run(self._compact, time.time())
+
+    async def _maintain(self) -> None:
+        last_compact = -math.inf
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                if time.monotonic() - last_compact >= COMPACT_INTERVAL:
+                    await self.compact()
+                    last_compact = time.monotonic()
+                else:
+                    await self._run(self._flush, self._take_pending())
+            except sqlite3.Error as ex:
+                _log.error("Failed to update time series database '%s': %s", self._file_path, ex)
+
+    async def _run[T](self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _take_pending(self) -> list[tuple[str, int, float, int]]:
+        pending, self._pending = self._pending, []
+        return pending
+
+    ################################################
+    ######## DATABASE THREAD (NOT THE LOOP) ########
+    ################################################
+
+    def _flush(self, pending: list[tuple[str, int, float, int]]) -> None:
+        if pending:
+            with self._connection:
+                self._connection.executemany("INSERT INTO raw VALUES (?, ?, ?, ?)", pending)
+
+    def _compact(self, now: float) -> None:
+        parameters = {
+            "raw_cutoff": (now - self._raw_retention) // HOUR * HOUR,
+            "hourly_cutoff": (now - self._hourly_retention) // DAY * DAY,
+        }
+        start = time.perf_counter()
+        with self._connection:
+            for statement in COMPACT_STATEMENTS:
+                self._connection.execute(statement, parameters)
+        _log.debug("Compacted time series database in %.1f ms", (time.perf_counter() - start) * 1000)
+
+    def _query(self, metric: str, start: Optional[float]) -> dict[int, TimeSeries]:
+        series: dict[int, TimeSeries] = {}
+        totals: dict[int, int] = {}
+        start_time = -math.inf if start is None else start
+        parameters = {"metric": metric, "start": start_time}
+
+        baseline_query = f"SELECT slot, SUM(count) FROM ({TIERS_QUERY}) WHERE time < :start GROUP BY slot"
+        for slot_id, count in self._connection.execute(baseline_query, parameters):
+            totals[slot_id] = count
+            series[slot_id] = [(start_time, count)]
+
+        points_query = f"SELECT slot, time, count FROM ({TIERS_QUERY}) WHERE time >= :start ORDER BY time"
+        for slot_id, point_time, count in self._connection.execute(points_query, parameters):
+            totals[slot_id] = totals.get(slot_id, 0) + count
+            series.setdefault(slot_id, []).append((point_time, totals[slot_id]))
+        return series
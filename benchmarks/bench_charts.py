@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from ados.charts import ChartRenderer, TimelineChart
+from ados.metrics import CHART_REQUESTS
+from ados.timeseries import CHECKS_METRIC, DAY, TimeSeriesStore
+from benchmarks.common import (
+    LoopLagMonitor,
+    make_config,
+    percentile,
+    report,
+    silence_logging,
+)
+
+RESULTS = ("hit", "shared", "render")
+
+
+# Per-slot check history spanning a long game, held in a real TimeSeriesStore (and compacted
+# into rollups just like in the bot), standing in for ADOSState
+class _Checks:
+
+    def __init__(self, store: TimeSeriesStore, slots: int, rng: random.Random):
+        self._store = store
+        self._slots = slots
+        self._rng = rng
+        self.version = 0
+        self.query_times: list[float] = []
+
+    def fill(self, days: int, checks: int) -> None:
+        now = time.time()
+        for slot in range(1, self._slots + 1):
+            for _ in range(checks):
+                self._store.record(CHECKS_METRIC, slot, timestamp=now - self._rng.uniform(0, days * DAY))
+
+    def add_check(self) -> None:
+        self._store.record(CHECKS_METRIC, self._rng.randrange(1, self._slots + 1))
+        self.version += 1
+
+    async def chart(self) -> TimelineChart:
+        start = time.perf_counter()
+        history = await self._store.query(CHECKS_METRIC)
+        self.query_times.append(time.perf_counter() - start)
+        series = {f"Player{slot_id}": points for slot_id, points in history.items()}
+        return TimelineChart(title="Checks completed per slot", ylabel="Checks", series=series)
+
+
+# Measures chart rendering through ChartRenderer, with chart data queried from the rollups of a
+# TimeSeriesStore holding a long game's history: first the latency of renders (each request
+# for new data), then a mix of concurrent requests with occasional data changes in between, as
+# when several users ask for the same graph. Event loop lag is sampled throughout, to confirm
+# that rendering does not block the loop.
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as data_path:
+        config = make_config(data_path, chart_processes=args.processes)
+        store = TimeSeriesStore(config)
+        checks = _Checks(store, args.slots, rng)
+        checks.fill(args.days, args.checks)
+        start = time.perf_counter()
+        await store.compact()
+        compact_time = time.perf_counter() - start
+        database_size = os.path.getsize(os.path.join(data_path, f"{config.archipelago_room}_timeseries.db"))
+
+        renderer = ChartRenderer(config)
+        try:
+            async with LoopLagMonitor() as lag:
+                start = time.perf_counter()
+                image = await renderer.render("checks", checks.version, checks.chart)
+                first_render = time.perf_counter() - start
+
+                render_times: list[float] = []
+                for _ in range(args.renders):
+                    checks.add_check()
+                    start = time.perf_counter()
+                    await renderer.render("checks", checks.version, checks.chart)
+                    render_times.append(time.perf_counter() - start)
+
+                counts_before = {result: CHART_REQUESTS.value(result) for result in RESULTS}
+                request_times: list[float] = []
+
+                async def _request() -> None:
+                    start = time.perf_counter()
+                    await renderer.render("checks", checks.version, checks.chart)
+                    request_times.append(time.perf_counter() - start)
+
+                mix_start = time.perf_counter()
+                for _ in range(args.bursts):
+                    if rng.random() < args.change_rate:
+                        checks.add_check()
+                    await asyncio.gather(*(_request() for _ in range(args.concurrency)))
+                mix_elapsed = time.perf_counter() - mix_start
+                counts = {result: CHART_REQUESTS.value(result) - counts_before[result] for result in RESULTS}
+        finally:
+            renderer.close()
+            await store.stop()
+
+    total = int(sum(counts.values()))
+    report(
+        f"Chart rendering ({args.slots} slots x {args.checks} checks over {args.days} days, "
+        f"{args.processes} process(es))",
+        [
+            ("history database", f"{database_size / 1024:.0f} KiB after compaction ({compact_time * 1000:.0f} ms)"),
+            (
+                "history query",
+                f"p50 {statistics.median(checks.query_times) * 1000:.1f} ms, "
+                f"p99 {percentile(checks.query_times, 0.99) * 1000:.1f} ms",
+            ),
+            ("image size", f"{len(image) / 1024:.0f} KiB"),
+            ("first render", f"{first_render * 1000:.0f} ms (includes starting the process pool)"),
+            (
+                "render latency",
+                f"p50 {statistics.median(render_times) * 1000:.0f} ms, "
+                f"p99 {percentile(render_times, 0.99) * 1000:.0f} ms over {len(render_times)} renders",
+            ),
+            (
+                "request mix",
+                f"{total} requests in {args.bursts} bursts of {args.concurrency}, {mix_elapsed:.2f} s",
+            ),
+            (
+                "request latency",
+                f"p50 {statistics.median(request_times) * 1000:.2f} ms, "
+                f"p99 {percentile(request_times, 0.99) * 1000:.2f} ms",
+            ),
+            ("cached", f"{counts['hit']:.0f}"),
+            ("shared renders", f"{counts['shared']:.0f}"),
+            ("renders", f"{counts['render']:.0f}"),
+            ("hit rate", f"{(counts['hit'] + counts['shared']) / total * 100:.1f}%"),
+            ("event loop lag", lag.summary()),
+        ],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark chart rendering latency and caching")
+    parser.add_argument("--slots", type=int, default=32, help="number of slots (lines on the chart)")
+    parser.add_argument("--checks", type=int, default=500, help="checks per slot")
+    parser.add_argument("--days", type=int, default=60, help="length of the game's history in days")
+    parser.add_argument("--processes", type=int, default=1, help="rendering processes")
+    parser.add_argument("--renders", type=int, default=10, help="sequential renders of changed data")
+    parser.add_argument("--bursts", type=int, default=50, help="bursts of concurrent requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent requests per burst")
+    parser.add_argument("--change-rate", type=float, default=0.2, help="chance the data changes before a burst")
+    args = parser.parse_args()
+
+    silence_logging()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
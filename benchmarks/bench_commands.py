@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+from ados.arch.messages import ConnectedMessage
+from ados.discord.bot import ADOSBot
+from benchmarks.common import make_config, percentile, report, silence_logging
+from benchmarks.fake_archipelago import FakeMultiworld
+from benchmarks.fake_discord import FakeDiscord, FakeDiscordSession, current_command
+
+# Weighted mix of commands issued by the simulated users. Slot add/remove pick a random slot and
+# then add or remove it depending on whether the user is registered, so they never fail.
+COMMAND_MIX = [
+    ("hello", "!hello", 3),
+    ("info", "!info", 4),
+    ("help", "!help", 4),
+    ("help slot", "!help slot", 1),
+    ("threadme", "!threadme", 1),
+    ("slot add", "", 2),
+    ("slot list", "!slot list", 3),
+    ("slot remove", "", 2),
+]
+
+
+async def _simulate_user(
+    fake: FakeDiscord, index: int, args: argparse.Namespace, latencies: dict[str, list[float]]
+) -> None:
+    rng = random.Random(index)
+    channel_id = fake.channel_for(index)
+    user_id = fake.user_id(index)
+    registered: set[int] = set()
+    labels = [label for label, _, _ in COMMAND_MIX]
+    weights = [weight for _, _, weight in COMMAND_MIX]
+    templates = {label: template for label, template, _ in COMMAND_MIX}
+
+    for _ in range(args.commands):
+        label = rng.choices(labels, weights)[0]
+        content = templates[label]
+        if label in {"slot add", "slot remove"}:
+            if label == "slot remove" and registered:
+                slot = rng.choice(sorted(registered))
+            else:
+                slot = rng.randint(1, args.slots)
+            label = "slot remove" if slot in registered else "slot add"
+            content = f"!{label} Player{slot}"
+            registered ^= {slot}
+
+        token = current_command.set(label)
+        start = time.perf_counter()
+        await fake.send(channel_id, user_id, content)
+        latencies[label].append(time.perf_counter() - start)
+        current_command.reset(token)
+
+
+# Drives the Commands cog through ADOSBot.on_message with many concurrent simulated users,
+# against a fake Discord HTTP layer that records API calls and enforces rate limits.
+async def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as data_path:
+        channels = [f"channel-{index}" for index in range(args.channels)]
+        config = make_config(data_path, discord_channels=channels)
+        bot = ADOSBot(config)
+        session = FakeDiscordSession(
+            latency=args.latency / 1000,
+            rate_limit=args.rate_limit,
+            rate_window=args.rate_window,
+            advertise_limits=not args.hide_limits,
+        )
+        fake = FakeDiscord(bot, session, server=config.discord_server, channels=channels)
+        await fake.ready()
+
+        # Seed the room information that would normally come from archipelago.gg
+        multiworld = FakeMultiworld(slots=args.slots)
+        web = bot._web  # pylint: disable = protected-access
+        web._server_url = "wss://archipelago.gg:38281"  # pylint: disable = protected-access
+        web._tracker_url = "https://archipelago.gg/tracker/benchmark"  # pylint: disable = protected-access
+        connected = ConnectedMessage(multiworld.connected(0))
+        await bot._socket._handle_message(connected)  # pylint: disable = protected-access
+
+        latencies: dict[str, list[float]] = defaultdict(list)
+        start = time.perf_counter()
+        await asyncio.gather(*(_simulate_user(fake, index, args, latencies) for index in range(args.users)))
+        elapsed = time.perf_counter() - start
+
+    rows: list[tuple[str, str]] = []
+    for label in sorted(latencies):
+        samples = latencies[label]
+        p50 = statistics.median(samples) * 1000
+        p99 = percentile(samples, 0.99) * 1000
+        calls = session.calls[label] / len(samples)
+        limited = session.rate_limited[label]
+        rows.append(
+            (label, f"n={len(samples):<5} p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  {calls:.2f} calls/cmd  {limited} 429s")
+        )
+
+    all_samples = [sample for samples in latencies.values() for sample in samples]
+    total_calls = sum(session.calls.values())
+    rows.append(
+        (
+            "all",
+            f"n={len(all_samples):<5} p50 {statistics.median(all_samples) * 1000:7.2f} ms  "
+            f"p99 {percentile(all_samples, 0.99) * 1000:7.2f} ms  {total_calls / len(all_samples):.2f} calls/cmd  "
+            f"{sum(session.rate_limited.values())} 429s",
+        )
+    )
+    rows.append(("throughput", f"{len(all_samples) / elapsed:.0f} commands/s over {elapsed:.2f} s"))
+    report(f"Commands ({args.users} users, {args.channels} channels)", rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test bot commands against a fake Discord transport")
+    parser.add_argument("--users", type=int, default=50, help="number of concurrent simulated users")
+    parser.add_argument("--commands", type=int, default=40, help="commands issued by each user")
+    parser.add_argument("--channels", type=int, default=4, help="number of channels the users are spread over")
+    parser.add_argument("--slots", type=int, default=32, help="number of slots in the multiworld")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated Discord API latency in milliseconds")
+    parser.add_argument("--rate-limit", type=int, default=50, help="requests allowed per route per window")
+    parser.add_argument("--rate-window", type=float, default=1.0, help="rate limit window in seconds")
+    parser.add_argument("--hide-limits", action="store_true", help="omit rate limit headers, forcing 429 responses")
+    args = parser.parse_args()
+
+    silence_logging()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import gc
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+from typing import Any, Iterator
+
+import discord
+
+from ados.config import DiscordCacheProfile
+from ados.discord.bot import ADOSBot
+from benchmarks.common import make_config, report, silence_logging
+from benchmarks.fake_discord import (
+    BOT_USER_ID,
+    FIRST_CHANNEL_ID,
+    FIRST_USER_ID,
+    GUILD_ID,
+    SNOWFLAKES,
+    message_payload,
+    user_payload,
+)
+
+FIRST_ROLE_ID = 4000
+FIRST_VOICE_CHANNEL_ID = 5000
+
+
+# Resident set size of this process, from /proc where available (falling back to the peak)
+def current_rss() -> int:
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def member_payload(user_id: int, rng: random.Random, roles: int) -> dict[str, Any]:
+    return {
+        "user": user_payload(user_id),
+        "roles": [str(FIRST_ROLE_ID + rng.randrange(roles)) for _ in range(3)],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+    }
+
+
+def voice_state_payload(user_id: int, rng: random.Random, args: argparse.Namespace) -> dict[str, Any]:
+    return {
+        "user_id": str(user_id),
+        "channel_id": str(FIRST_VOICE_CHANNEL_ID + rng.randrange(args.channels // 4)),
+        "session_id": f"session-{user_id}",
+        "deaf": False,
+        "mute": False,
+        "self_deaf": False,
+        "self_mute": False,
+        "suppress": False,
+    }
+
+
+# Builds the GUILD_CREATE payload for a large server, including only what Discord would send for
+# the given intents (voice states need the voice intent, and the bot never requests members)
+def guild_payload(args: argparse.Namespace, intents: discord.Intents, rng: random.Random) -> dict[str, Any]:
+    text_channels = [
+        {"id": str(FIRST_CHANNEL_ID + index), "type": 0, "name": f"channel-{index}", "position": index}
+        for index in range(args.channels)
+    ]
+    voice_channels = [
+        {"id": str(FIRST_VOICE_CHANNEL_ID + index), "type": 2, "name": f"voice-{index}", "position": index}
+        for index in range(args.channels // 4)
+    ]
+    voice_members = range(FIRST_USER_ID, FIRST_USER_ID + args.voice_members) if intents.voice_states else range(0)
+    return {
+        "id": str(GUILD_ID),
+        "name": "benchmark",
+        "owner_id": str(BOT_USER_ID),
+        "member_count": args.members,
+        "features": [],
+        "roles": [
+            {
+                "id": str(FIRST_ROLE_ID + index),
+                "name": f"role-{index}",
+                "permissions": "0",
+                "position": index,
+                "colors": {"primary_color": 0},
+            }
+            for index in range(args.roles)
+        ],
+        "emojis": [
+            {"id": str(next(SNOWFLAKES)), "name": f"emoji_{index}", "roles": [], "animated": False}
+            for index in range(args.emojis)
+        ],
+        "channels": text_channels + voice_channels,
+        "members": [{**member_payload(BOT_USER_ID, rng, args.roles), "user": user_payload(BOT_USER_ID, bot=True)}],
+        "voice_states": [voice_state_payload(user_id, rng, args) for user_id in voice_members],
+        "threads": [],
+    }
+
+
+# Generates the gateway events of a busy server, again only those the intents subscribe to:
+# chatter in every channel from across the member list, with reactions, typing, and members
+# moving between voice channels in between
+def gateway_events(args: argparse.Namespace, intents: discord.Intents, rng: random.Random) -> Iterator[tuple[str, Any]]:
+    message_ids: list[str] = []
+    for _ in range(args.messages):
+        channel_id = FIRST_CHANNEL_ID + rng.randrange(args.channels)
+        author_id = FIRST_USER_ID + rng.randrange(args.members)
+        content = " ".join(f"word{rng.randrange(10_000)}" for _ in range(rng.randint(5, 60)))
+        message = message_payload(channel_id, author_id, content)
+        message["member"] = {
+            key: value for key, value in member_payload(author_id, rng, args.roles).items() if key != "user"
+        }
+        yield "MESSAGE_CREATE", message
+        message_ids.append(message["id"])
+
+        if intents.guild_reactions and rng.random() < 0.3:
+            reacted = rng.choice(message_ids)
+            reaction = {"user_id": str(author_id), "channel_id": str(channel_id), "message_id": reacted}
+            yield "MESSAGE_REACTION_ADD", {**reaction, "guild_id": str(GUILD_ID), "emoji": {"name": "👍"}}
+        if intents.guild_typing and rng.random() < 0.5:
+            typing = {"user_id": str(author_id), "channel_id": str(channel_id), "timestamp": 0}
+            yield "TYPING_START", {**typing, "guild_id": str(GUILD_ID)}
+        if intents.voice_states and rng.random() < 0.2:
+            voice_state = voice_state_payload(author_id, rng, args)
+            member = member_payload(author_id, rng, args.roles)
+            yield "VOICE_STATE_UPDATE", {**voice_state, "guild_id": str(GUILD_ID), "member": member}
+
+
+# Feeds a simulated large server through py-cord's gateway event parsers, exactly as the gateway
+# would (including dispatch to ADOSBot.on_message), then measures the resulting resident memory.
+# Events are generated as they are fed, so the only memory held on to is what the client caches.
+async def measure(profile: DiscordCacheProfile, args: argparse.Namespace) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as data_path:
+        config = make_config(data_path, discord_cache_profile=profile, discord_channels=["channel-0"])
+        bot = ADOSBot(config)
+        state = bot._connection  # pylint: disable = protected-access
+        state.user = discord.ClientUser(state=state, data=user_payload(BOT_USER_ID, bot=True))  # type: ignore[arg-type]
+        rng = random.Random(0)
+
+        gc.collect()
+        baseline = current_rss()
+        state.parsers["GUILD_CREATE"](guild_payload(args, state.intents, rng))
+        await bot.on_ready()
+        event_count = 0
+        for event, data in gateway_events(args, state.intents, rng):
+            state.parsers[event](data)
+            event_count += 1
+            if event_count % 100 == 0:
+                await asyncio.sleep(0)
+        await asyncio.sleep(0.1)
+        gc.collect()
+        steady = current_rss()
+
+        guild = bot.get_guild(GUILD_ID)
+        assert guild is not None
+        return {
+            "rss": steady,
+            "growth": steady - baseline,
+            "events": event_count,
+            "messages": len(bot.cached_messages),
+            "members": len(guild.members),
+            "users": len(bot.users),
+        }
+
+
+def run_child(args: argparse.Namespace) -> None:
+    silence_logging()
+    result = asyncio.run(measure(DiscordCacheProfile(args.child), args))
+    print(json.dumps(result))
+
+
+# Each profile is measured in a fresh interpreter, so that neither inherits the other's heap
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure steady-state memory of each Discord cache profile")
+    parser.add_argument("--members", type=int, default=50000, help="members in the simulated server")
+    parser.add_argument("--voice-members", type=int, default=2000, help="members in voice channels")
+    parser.add_argument("--channels", type=int, default=200, help="text channels in the server")
+    parser.add_argument("--roles", type=int, default=250, help="roles in the server")
+    parser.add_argument("--emojis", type=int, default=200, help="custom emojis in the server")
+    parser.add_argument("--messages", type=int, default=20000, help="messages received")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        run_child(args)
+        return
+
+    results: dict[DiscordCacheProfile, dict[str, Any]] = {}
+    for profile in DiscordCacheProfile:
+        command = [sys.executable, "-m", "benchmarks.bench_discord_memory", *sys.argv[1:], "--child", profile.value]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        results[profile] = json.loads(output.splitlines()[-1])
+
+    for profile, result in results.items():
+        report(
+            f"Discord cache profile: {profile.value}",
+            [
+                ("gateway events", f"{result["events"]}"),
+                ("cached messages", f"{result["messages"]}"),
+                ("cached members", f"{result["members"]}"),
+                ("cached users", f"{result["users"]}"),
+                ("steady-state RSS", f"{result["rss"] / 1024 / 1024:.1f} MiB"),
+                ("growth from server", f"{result["growth"] / 1024 / 1024:.1f} MiB"),
+            ],
+        )
+    default, minimal = results[DiscordCacheProfile.DEFAULT], results[DiscordCacheProfile.MINIMAL]
+    report("Savings", [("RSS", f"{(default["rss"] - minimal["rss"]) / 1024 / 1024:.1f} MiB")])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import NamedTuple
+
+from benchmarks.common import report
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server.py")
+
+
+# One startup stage to measure: the imports it performs, the budget for their total import time,
+# and modules it must not load at all (because they are only needed later, or only on demand)
+class ImportStage(NamedTuple):
+    name: str
+    code: str
+    budget_ms: float
+    forbidden: tuple[str, ...]
+
+
+class ImportProfile(NamedTuple):
+    total_ms: float
+    modules: dict[str, float]  # Maps the modules imported directly by the stage to cumulative import time (ms)
+    loaded: set[str]
+
+
+# Imports in a fresh interpreter with -X importtime, which reports (self, cumulative) microseconds
+# for every module imported, nested by indentation. Modules already loaded by interpreter startup
+# (listed in 'baseline') are left out, so only the cost of the stage itself is counted.
+def profile_imports(code: str, baseline: frozenset[str] = frozenset()) -> ImportProfile:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    total = 0.0
+    modules: dict[str, float] = {}
+    loaded: set[str] = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        module = name.strip()
+        if module in baseline:
+            continue
+        total += int(self_us) / 1000
+        loaded.add(module)
+        if len(name) - len(name.lstrip()) <= 3:
+            modules[module] = int(cumulative_us) / 1000
+    return ImportProfile(total, modules, loaded)
+
+
+# Time taken by server.py to report a missing config file and exit, i.e. the cost of a failed start
+def config_error_exit_ms() -> float:
+    with tempfile.TemporaryDirectory() as temp_path:
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, SERVER_PATH, os.path.join(temp_path, "missing.yaml")],
+            capture_output=True,
+            check=False,
+            cwd=os.path.dirname(SERVER_PATH),
+        )
+        return (time.perf_counter() - start) * 1000
+
+
+# Measures the import time of each startup stage in fresh interpreters, keeping the best of several
+# runs to filter out noise. Exits with an error if any stage goes over its budget, or loads a module
+# it should only be loading lazily.
+def run(stages: list[ImportStage], repeats: int) -> bool:
+    within_budget = True
+    baseline = frozenset(profile_imports("pass").loaded)
+    for stage in stages:
+        profiles = (profile_imports(stage.code, baseline) for _ in range(repeats))
+        profile = min(profiles, key=lambda profile: profile.total_ms)
+        eager = sorted(module for module in stage.forbidden if module in profile.loaded)
+        roots = {module.strip() for module in stage.code.removeprefix("import ").split(",")}
+        slowest = sorted(
+            ((module, elapsed) for module, elapsed in profile.modules.items() if module not in roots),
+            key=lambda item: -item[1],
+        )[:5]
+        passed = profile.total_ms <= stage.budget_ms and not eager
+        within_budget &= passed
+
+        report(
+            f"Import time: {stage.name}",
+            [
+                ("code", stage.code),
+                ("total", f"{profile.total_ms:.1f} ms (budget {stage.budget_ms:.0f} ms)"),
+                ("modules loaded", f"{len(profile.loaded)}"),
+                ("slowest", ", ".join(f"{module} {elapsed:.1f} ms" for module, elapsed in slowest)),
+                ("loaded eagerly", ", ".join(eager) or "none"),
+                ("result", "ok" if passed else "OVER BUDGET"),
+            ],
+        )
+
+    exit_ms = min(config_error_exit_ms() for _ in range(repeats))
+    report("Failed start", [("config error exit", f"{exit_ms:.1f} ms (interpreter startup included)")])
+    return within_budget
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check startup import time against budgets")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per stage (best is kept)")
+    parser.add_argument("--config-budget", type=float, default=400, help="budget for config and logging (ms)")
+    parser.add_argument("--bot-budget", type=float, default=1200, help="budget for the full bot (ms)")
+    args = parser.parse_args()
+
+    lazy_modules = ("multiprocessing", "concurrent.futures.process", "cProfile", "pstats", "aiohttp.web")
+    stages = [
+        ImportStage("entry point", "import server", 150, ("ados.config", "pydantic", "discord")),
+        ImportStage(
+            "config and logging",
+            "import ados.config, ados.logger",
+            args.config_budget,
+            ("discord", "aiohttp", "websockets", "ados.arch.socket"),
+        ),
+        ImportStage("bot", "import ados.discord.bot", args.bot_budget, ("matplotlib", *lazy_modules)),
+    ]
+    if not run(stages, args.repeats):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
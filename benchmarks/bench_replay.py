@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import glob
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+
+from ados.arch.socket import SocketClient
+from ados.config import ADOSConfig
+from ados.state import ADOSState
+from benchmarks.common import LoopLagMonitor, make_config, report, silence_logging
+from benchmarks.fake_archipelago import FakeArchipelagoServer, FakeMultiworld
+
+
+# Records a capture by running a capturing SocketClient against the fake server
+async def _record_capture(config: ADOSConfig, frames: int) -> str:
+    multiworld = FakeMultiworld(games=8, items_per_game=2000, locations_per_game=2000, slots=16)
+    async with FakeArchipelagoServer(multiworld, multiworld.generate_stream(frames), speed=None) as server:
+        socket = SocketClient(config, slot_name="ArchipelaDOS", game="Archipelago", fetch_data=True)
+        await socket.connect(server.url)
+        await socket._socket_task  # type: ignore[misc]  # pylint: disable = protected-access
+        socket._capture.close()  # type: ignore[union-attr]  # pylint: disable = protected-access
+    return sorted(glob.glob(os.path.join(config.data_path, "*_capture_*.jsonl.gz")))[-1]
+
+
+# Replays a socket capture through deserialize() and the registered handlers (with ADOSState
+# attached, as in the bot), with no network involved. Without a capture path, one is recorded
+# first from generated traffic against the fake Archipelago server.
+async def run(capture_path: Optional[str], frames: int, speed: Optional[float]) -> None:
+    with tempfile.TemporaryDirectory() as data_path:
+        if capture_path is None:
+            capture_path = await _record_capture(make_config(data_path, socket_capture=True), frames)
+
+        config = make_config(data_path)
+        socket = SocketClient(config, slot_name="ArchipelaDOS", game="Archipelago", fetch_data=True)
+        ADOSState(config, socket)
+
+        tracemalloc.start()
+        async with LoopLagMonitor() as lag:
+            start = time.perf_counter()
+            replayed = await socket.replay(capture_path, speed=speed)
+            elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        report(
+            "Capture replay",
+            [
+                ("capture", capture_path),
+                ("capture size", f"{os.path.getsize(capture_path) / 1024:.0f} KiB"),
+                ("frames", f"{replayed}"),
+                ("pacing", "maximum speed" if speed is None else f"{speed}x recorded rate"),
+                ("elapsed", f"{elapsed:.2f} s"),
+                ("throughput", f"{replayed / elapsed:.0f} frames/s"),
+                ("peak traced memory", f"{peak / 1024 / 1024:.1f} MiB"),
+                ("event loop lag", lag.summary()),
+            ],
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a socket capture through the message handlers")
+    parser.add_argument("capture", nargs="?", default=None, help="capture file (default: record one first)")
+    parser.add_argument("--frames", type=int, default=20000, help="frames to record when no capture is given")
+    parser.add_argument("--speed", type=float, default=None, help="replay at this multiple of the recorded pace")
+    args = parser.parse_args()
+
+    silence_logging()
+    asyncio.run(run(args.capture, args.frames, args.speed))
+
+
+if __name__ == "__main__":
+    main()
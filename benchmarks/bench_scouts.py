@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+from ados.arch.socket import SocketClient
+from ados.common import SlotInfo
+from ados.state import ADOSState
+from benchmarks.common import make_config, percentile, report, silence_logging
+from benchmarks.fake_archipelago import FakeArchipelagoServer, FakeMultiworld
+
+
+# Runs a round of concurrent location lookups, as from many commands at once, each asking about
+# a handful of locations of one slot. Returns the latency of every lookup. Every round makes the
+# same lookups, so that later rounds should be answered entirely from the cache.
+async def lookup_round(
+    state: ADOSState, multiworld: FakeMultiworld, args: argparse.Namespace, rng: random.Random
+) -> list[float]:
+    slots = state.all_slots()
+    latencies: list[float] = []
+
+    async def _lookup(slot: SlotInfo, location_ids: list[int]) -> None:
+        start = time.perf_counter()
+        scouts = await state.scout_locations(slot, location_ids)
+        latencies.append(time.perf_counter() - start)
+        assert len(scouts) == len(set(location_ids))
+
+    lookups = []
+    for _ in range(args.lookups):
+        slot = rng.choice(slots)
+        indices = [rng.randrange(args.hot_locations) for _ in range(args.locations_per_lookup)]
+        lookups.append(_lookup(slot, [multiworld.location_id(slot.game, index) for index in indices]))
+    await asyncio.gather(*lookups)
+    return latencies
+
+
+# Measures how lookups are coalesced into LocationScouts requests against the fake server: a
+# cold round (nothing cached), a warm round (everything cached), and a round after restarting
+# from the snapshot (everything loaded from disk, so no connections at all)
+async def run(args: argparse.Namespace) -> None:
+    multiworld = FakeMultiworld(games=8, items_per_game=2000, locations_per_game=2000, slots=args.slots)
+    with tempfile.TemporaryDirectory() as data_path:
+        config = make_config(data_path, scout_slot_connections=True)
+        async with FakeArchipelagoServer(multiworld, keep_open=True) as server:
+            rounds: list[tuple[str, list[float], int, int]] = []
+            for name in ("cold", "warm", "restarted"):
+                if name != "warm":
+                    socket = SocketClient(config, slot_name="ArchipelaDOS", game="Archipelago", fetch_data=False)
+                    state = ADOSState(config, socket)
+                    await state.start()
+                    await socket.connect(server.url)
+                    await asyncio.sleep(0.1)  # Let the rest of the snapshot load
+
+                requests, connections = len(server.scout_requests), server.connections
+                latencies = await lookup_round(state, multiworld, args, random.Random(0))
+                rounds.append(
+                    (name, latencies, len(server.scout_requests) - requests, server.connections - connections)
+                )
+                if name != "cold":
+                    await state.stop()
+                    await socket.close()
+
+        for name, latencies, requests, connections in rounds:
+            report(
+                f"Location lookups: {name}",
+                [
+                    ("lookups", f"{args.lookups} x {args.locations_per_lookup} locations"),
+                    ("scout requests", f"{requests}"),
+                    ("slot connections opened", f"{connections}"),
+                    ("p50 latency", f"{percentile(latencies, 0.5) * 1000:.2f} ms"),
+                    ("p99 latency", f"{percentile(latencies, 0.99) * 1000:.2f} ms"),
+                ],
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure batching and caching of location scouts")
+    parser.add_argument("--slots", type=int, default=16, help="slots in the multiworld")
+    parser.add_argument("--lookups", type=int, default=2000, help="concurrent lookups per round")
+    parser.add_argument("--locations-per-lookup", type=int, default=5, help="locations asked about per lookup")
+    parser.add_argument("--hot-locations", type=int, default=200, help="locations per slot that lookups ask about")
+    args = parser.parse_args()
+
+    silence_logging()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import gc
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+from ados.arch.socket import SocketClient
+from ados.state import ADOSState
+from benchmarks.common import LoopLagMonitor, make_config, report, silence_logging
+from benchmarks.fake_archipelago import (
+    FakeArchipelagoServer,
+    FakeMultiworld,
+    StreamFrame,
+    load_stream,
+)
+
+# Receive modes to measure the handshake in: (name, config)
+HANDSHAKE_MODES: list[tuple[str, dict[str, Any]]] = [
+    ("whole data package", {}),
+    ("one game at a time", {"socket_data_package_per_game": True}),
+]
+
+
+# Connects repeatedly with the given config overrides, and returns the time taken by each
+# handshake, along with the highest peak of traced memory during any one of them and how much of
+# that was still held afterwards (i.e. the parsed tables, rather than the cost of receiving them)
+async def measure_handshakes(
+    multiworld: FakeMultiworld, data_path: str, count: int, **overrides: Any
+) -> tuple[list[float], int, int]:
+    config = make_config(data_path, **overrides)
+    times: list[float] = []
+    peak = retained = 0
+    tracemalloc.start()
+    async with FakeArchipelagoServer(multiworld) as server:
+        for _ in range(count):
+            socket = SocketClient(config, slot_name="ArchipelaDOS", game="Archipelago", fetch_data=True)
+            ADOSState(config, socket)
+            gc.collect()
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            await socket.connect(server.url)
+            times.append(time.perf_counter() - start)
+            gc.collect()
+            current, current_peak = tracemalloc.get_traced_memory()
+            if current_peak - baseline > peak:
+                peak, retained = current_peak - baseline, current - baseline
+            await socket.close()
+    tracemalloc.stop()
+    return times, peak, retained
+
+
+# Measures the SocketClient path against a local fake server: the connection handshake
+# (including the data package) in each receive mode, and the throughput of frames through
+# deserialize() and the registered message handlers, with ADOSState attached just like in the bot.
+async def run(args: argparse.Namespace) -> None:
+    multiworld = FakeMultiworld(
+        games=args.games, items_per_game=args.items, locations_per_game=args.items, slots=args.slots
+    )
+    stream: list[StreamFrame]
+    if args.replay:
+        stream = load_stream(args.replay)
+    else:
+        stream = multiworld.generate_stream(args.frames, rate=args.rate)
+    # Generated frames without a rate are all stamped at time zero, so they are sent unpaced
+    # whatever the speed
+    speed = None if args.max_speed or (not args.replay and args.rate is None) else args.speed
+
+    with tempfile.TemporaryDirectory() as data_path:
+        config = make_config(data_path)
+
+        # Handshake timing and memory in each receive mode, without any stream afterwards
+        handshakes = {
+            name: await measure_handshakes(multiworld, data_path, args.handshakes, **overrides)
+            for name, overrides in HANDSHAKE_MODES
+        }
+
+        # Stream throughput and event loop lag while the frames are processed
+        tracemalloc.start()
+        async with FakeArchipelagoServer(multiworld, stream, speed=speed) as server:
+            socket = SocketClient(config, slot_name="ArchipelaDOS", game="Archipelago", fetch_data=True)
+            ADOSState(config, socket)
+            await socket.connect(server.url)
+            socket_task = socket._socket_task  # pylint: disable = protected-access
+            assert socket_task is not None
+            tracemalloc.reset_peak()
+            async with LoopLagMonitor() as lag:
+                start = time.perf_counter()
+                await socket_task
+                elapsed = time.perf_counter() - start
+        _, stream_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    data_package_items = args.games * args.items * 2
+    for name, (handshake_times, handshake_peak, handshake_retained) in handshakes.items():
+        report(
+            f"Handshake: {name}",
+            [
+                ("data package entries", f"{data_package_items}"),
+                ("handshake median", f"{statistics.median(handshake_times) * 1000:.1f} ms"),
+                ("handshake max", f"{max(handshake_times) * 1000:.1f} ms"),
+                ("peak traced memory", f"{handshake_peak / 1024 / 1024:.1f} MiB"),
+                ("retained afterwards", f"{handshake_retained / 1024 / 1024:.1f} MiB"),
+                ("receive overhead", f"{(handshake_peak - handshake_retained) / 1024 / 1024:.1f} MiB"),
+            ],
+        )
+    report(
+        "Stream",
+        [
+            ("frames", f"{len(stream)}"),
+            ("pacing", "unpaced" if speed is None else f"{speed}x recorded rate"),
+            ("elapsed", f"{elapsed:.2f} s"),
+            ("throughput", f"{len(stream) / elapsed:.0f} frames/s"),
+            ("peak traced memory", f"{stream_peak / 1024 / 1024:.1f} MiB"),
+            ("event loop lag", lag.summary()),
+        ],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Archipelago socket path against a fake server")
+    parser.add_argument("--games", type=int, default=8, help="number of games in the data package")
+    parser.add_argument("--items", type=int, default=2000, help="items (and locations) per game")
+    parser.add_argument("--slots", type=int, default=16, help="number of slots in the multiworld")
+    parser.add_argument("--handshakes", type=int, default=5, help="number of handshakes to time")
+    parser.add_argument("--frames", type=int, default=20000, help="number of generated frames to stream")
+    parser.add_argument("--rate", type=float, default=None, help="generated frames per second (default: unpaced)")
+    parser.add_argument("--replay", default=None, help="recorded stream to replay instead of generated frames")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier for recorded timestamps")
+    parser.add_argument("--max-speed", action="store_true", help="ignore timestamps and replay as fast as possible")
+    args = parser.parse_args()
+
+    silence_logging()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import statistics
+import time
+from typing import Any, Optional, Self
+
+from ados.config import ADOSConfig, LoggingBehavior
+
+
+# Builds a configuration suitable for benchmarks; nothing is sent to Discord or archipelago.gg
+def make_config(data_path: str, **overrides: Any) -> ADOSConfig:
+    values: dict[str, Any] = {
+        "archipelago_room": "benchmark",
+        "archipelago_slot": "ArchipelaDOS",
+        "discord_token": "benchmark",
+        "discord_server": "benchmark",
+        "discord_channels": [],
+        "data_path": data_path,
+        "logging_behavior": LoggingBehavior.NONE,
+        "logging_path": None,
+        "logging_level": "error",
+        "logging_color": False,
+    }
+    values.update(overrides)
+    return ADOSConfig(**values)
+
+
+# Keeps library and bot logging from polluting benchmark output (and from being timed)
+def silence_logging() -> None:
+    root_log = logging.getLogger()
+    root_log.addHandler(logging.NullHandler())
+    root_log.setLevel(logging.ERROR)
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(fraction * len(ordered)))
+    return ordered[index]
+
+
+def report(title: str, rows: list[tuple[str, str]]) -> None:
+    print(f"\n{title}")
+    name_len = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        padding = " " * (name_len - len(name))
+        print(f"  {name}{padding}  {value}")
+
+
+# Measures event loop lag by repeatedly sleeping for a short interval and recording how late
+# the loop was in waking back up. Large values mean something hogged the event loop.
+class LoopLagMonitor:
+
+    def __init__(self, interval: float = 0.005):
+        self._interval = interval
+        self._task: Optional[asyncio.Task[None]] = None
+        self.samples: list[float] = []
+
+    async def __aenter__(self) -> Self:
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        assert self._task is not None
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self._interval))
+
+    def summary(self) -> str:
+        if not self.samples:
+            return "no samples"
+        p50 = statistics.median(self.samples) * 1000
+        p99 = percentile(self.samples, 0.99) * 1000
+        worst = max(self.samples) * 1000
+        return f"p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {worst:.2f} ms"
@@ -0,0 +1,292 @@
+import asyncio
+import gzip
+import json
+import random
+import threading
+import time
+from typing import IO, Any, NamedTuple, Optional, Self
+
+from websockets.asyncio.server import Server, ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+from ados.arch.messages import ARCH_BUILD, ARCH_MAJOR, ARCH_MINOR
+
+
+# A single server frame to be replayed, along with the time (in seconds, relative to the
+# start of the stream) at which it should be sent
+class StreamFrame(NamedTuple):
+    time: float
+    frame: str
+
+
+# Describes the synthetic multiworld served by the fake server
+class FakeMultiworld:
+
+    def __init__(self, *, games: int = 4, items_per_game: int = 1000, locations_per_game: int = 1000, slots: int = 8):
+        self.games = [f"Game {index}" for index in range(games)]
+        self.items_per_game = items_per_game
+        self.locations_per_game = locations_per_game
+        self.slot_games = {slot: self.games[(slot - 1) % games] for slot in range(1, slots + 1)}
+        self.aliases = {slot: f"Player{slot}" for slot in self.slot_games}
+
+    def item_id(self, game: str, index: int) -> int:
+        return self.games.index(game) * 100_000 + index
+
+    def location_id(self, game: str, index: int) -> int:
+        return self.games.index(game) * 100_000 + 50_000 + index
+
+    def data_package(self, games: list[str]) -> dict[str, Any]:
+        package: dict[str, Any] = {}
+        for game in games:
+            if game not in self.games:
+                continue
+            package[game] = {
+                "item_name_to_id": {f"{game} Item {i}": self.item_id(game, i) for i in range(self.items_per_game)},
+                "location_name_to_id": {
+                    f"{game} Location {i}": self.location_id(game, i) for i in range(self.locations_per_game)
+                },
+                "checksum": f"fake-{game}",
+            }
+        return {"cmd": "DataPackage", "data": {"games": package}}
+
+    def players(self) -> list[dict[str, Any]]:
+        return [
+            {"team": 0, "slot": slot, "name": f"Player{slot}", "alias": alias, "class": "NetworkPlayer"}
+            for slot, alias in self.aliases.items()
+        ]
+
+    def slot_info(self) -> dict[str, Any]:
+        return {
+            str(slot): {"name": f"Player{slot}", "game": game, "type": 1, "group_members": [], "class": "NetworkSlot"}
+            for slot, game in self.slot_games.items()
+        }
+
+    # Connected response for a slot, which owns every location of its game. Slot 0 (the server
+    # itself, as far as Archipelago is concerned) has no locations.
+    def connected(self, slot: int) -> dict[str, Any]:
+        game = self.slot_games.get(slot)
+        locations = [self.location_id(game, i) for i in range(self.locations_per_game)] if game is not None else []
+        return {
+            "cmd": "Connected",
+            "team": 0,
+            "slot": slot,
+            "players": self.players(),
+            "missing_locations": locations,
+            "checked_locations": [],
+            "slot_data": {},
+            "slot_info": self.slot_info(),
+            "hint_points": 0,
+        }
+
+    # The item placed at one of a slot's locations, chosen deterministically from the two
+    def scout(self, slot: int, location: int) -> dict[str, Any]:
+        slots = list(self.slot_games)
+        receiver = slots[(slot * 31 + location) % len(slots)]
+        item = self.item_id(self.slot_games[receiver], location % self.items_per_game)
+        return {"item": item, "location": location, "player": receiver, "flags": location % 3, "class": "NetworkItem"}
+
+    def item_send(self, rng: random.Random) -> dict[str, Any]:
+        sender = rng.choice(list(self.slot_games))
+        receiver = rng.choice(list(self.slot_games))
+        item = self.item_id(self.slot_games[receiver], rng.randrange(self.items_per_game))
+        location = self.location_id(self.slot_games[sender], rng.randrange(self.locations_per_game))
+        flags = rng.choice([0, 0, 0, 1, 1, 2, 4])
+        return {
+            "cmd": "PrintJSON",
+            "type": "ItemSend",
+            "receiving": receiver,
+            "item": {"item": item, "location": location, "player": sender, "flags": flags, "class": "NetworkItem"},
+            "data": [
+                {"type": "player_id", "text": str(sender)},
+                {"text": " sent "},
+                {"type": "item_id", "text": str(item), "player": receiver, "flags": flags},
+                {"text": " to "},
+                {"type": "player_id", "text": str(receiver)},
+                {"text": " ("},
+                {"type": "location_id", "text": str(location), "player": sender},
+                {"text": ")"},
+            ],
+        }
+
+    def room_update(self, rng: random.Random) -> dict[str, Any]:
+        slot = rng.choice(list(self.slot_games))
+        self.aliases[slot] = f"Alias{rng.randrange(1_000_000)}"
+        return {"cmd": "RoomUpdate", "players": self.players()}
+
+    # A DeathLink cascade: one slot dies, and others die in turn as the death reaches them
+    def death_links(self, rng: random.Random) -> list[dict[str, Any]]:
+        now = time.time()
+        sources = rng.sample(list(self.slot_games), rng.randint(1, min(4, len(self.slot_games))))
+        return [
+            {
+                "cmd": "Bounced",
+                "tags": ["DeathLink"],
+                "data": {"time": now + index * 0.01, "source": f"Player{slot}", "cause": f"Player{slot} fell over"},
+            }
+            for index, slot in enumerate(sources)
+        ]
+
+    # Generates a stream of mostly item sends with the occasional alias change or death cascade
+    def generate_stream(self, frames: int, *, rate: Optional[float] = None, seed: int = 0) -> list[StreamFrame]:
+        rng = random.Random(seed)
+        stream: list[StreamFrame] = []
+        for index in range(frames):
+            roll = rng.random()
+            if roll < 0.02:
+                messages = [self.room_update(rng)]
+            elif roll < 0.025:
+                messages = self.death_links(rng)
+            else:
+                messages = [self.item_send(rng)]
+            frame_time = index / rate if rate else 0.0
+            stream.append(StreamFrame(frame_time, json.dumps(messages)))
+        return stream
+
+
+# Reads a recorded stream. Each line is a JSON object with a "t" timestamp and the raw "frame"
+# text; files ending in ".gz" are decompressed. Lines with a "dir" other than "in" (frames sent
+# by the client, when present) are skipped.
+def load_stream(path: str) -> list[StreamFrame]:
+    stream_file: IO[str]
+    if path.endswith(".gz"):
+        stream_file = gzip.open(path, "rt")
+    else:
+        stream_file = open(path, "r")
+
+    stream: list[StreamFrame] = []
+    with stream_file:
+        for line in stream_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("dir", "in") != "in":
+                continue
+            stream.append(StreamFrame(float(record["t"]), record["frame"]))
+
+    if stream:
+        start = stream[0].time
+        stream = [StreamFrame(frame.time - start, frame.frame) for frame in stream]
+    return stream
+
+
+# A local stand-in for an Archipelago server. Performs the RoomInfo/GetDataPackage/Connect
+# handshake expected by SocketClient, then replays the configured stream of frames and closes
+# the connection. Replay is paced by the frame timestamps scaled by 'speed', or as fast as
+# possible when speed is None. With keep_open set, connections instead stay open after the
+# replay and answer LocationScouts requests, which are counted in 'scout_requests'. The server
+# runs its own event loop on a separate thread, so that serving frames does not count against
+# the client's event loop in measurements.
+class FakeArchipelagoServer:
+
+    def __init__(
+        self,
+        multiworld: FakeMultiworld,
+        stream: Optional[list[StreamFrame]] = None,
+        *,
+        speed: Optional[float] = 1.0,
+        host: str = "127.0.0.1",
+        keep_open: bool = False,
+    ):
+        self._multiworld = multiworld
+        self._stream = stream or []
+        self._speed = speed
+        self._host = host
+        self._keep_open = keep_open
+        self._port: Optional[int] = None
+        self.connections = 0
+        self.scout_requests: list[int] = []  # Number of locations in each LocationScouts request
+
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    @property
+    def url(self) -> str:
+        assert self._port is not None
+        return f"ws://{self._host}:{self._port}"
+
+    async def __aenter__(self) -> Self:
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), name="fake-archipelago")
+        self._thread.start()
+        await asyncio.to_thread(self._started.wait)
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        assert self._thread is not None and self._loop is not None and self._stop is not None
+        self._loop.call_soon_threadsafe(self._stop.set)
+        await asyncio.to_thread(self._thread.join)
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server: Server
+        async with serve(self._handle_client, self._host, 0, max_size=None) as server:
+            self._port = next(iter(server.sockets)).getsockname()[1]
+            self._started.set()
+            await self._stop.wait()
+
+    def room_info(self) -> dict[str, Any]:
+        return {
+            "cmd": "RoomInfo",
+            "version": {"major": ARCH_MAJOR, "minor": ARCH_MINOR, "build": ARCH_BUILD, "class": "Version"},
+            "generator_version": {"major": ARCH_MAJOR, "minor": ARCH_MINOR, "build": ARCH_BUILD, "class": "Version"},
+            "tags": ["AP"],
+            "password": False,
+            "permissions": {"release": 2, "collect": 2, "remaining": 2},
+            "hint_cost": 10,
+            "location_check_points": 1,
+            "games": ["Archipelago", *self._multiworld.games],
+            "datapackage_checksums": {game: f"fake-{game}" for game in self._multiworld.games},
+            "seed_name": "fake",
+            "time": time.time(),
+        }
+
+    async def _handle_client(self, connection: ServerConnection) -> None:
+        slot = 0
+        replay: Optional[asyncio.Task[None]] = None
+        try:
+            await connection.send(json.dumps([self.room_info()]))
+            async for raw_message in connection:
+                for message in json.loads(raw_message):
+                    if message["cmd"] == "GetDataPackage":
+                        await connection.send(json.dumps([self._multiworld.data_package(message["games"])]))
+                    elif message["cmd"] == "Connect":
+                        slot = next((s for s in self._multiworld.slot_games if message["name"] == f"Player{s}"), 0)
+                        self.connections += 1
+                        await connection.send(json.dumps([self._multiworld.connected(slot)]))
+                        if self._keep_open:
+                            replay = asyncio.create_task(self._replay(connection))
+                            continue
+                        await self._replay(connection)
+                        await connection.close()
+                        return
+                    elif message["cmd"] == "LocationScouts":
+                        self.scout_requests.append(len(message["locations"]))
+                        await connection.send(json.dumps([self._scouted(slot, message["locations"])]))
+        except ConnectionClosed:
+            pass
+        finally:
+            if replay is not None:
+                replay.cancel()
+
+    # Like Archipelago, rejects the whole request if any location does not belong to the slot
+    def _scouted(self, slot: int, locations: list[int]) -> dict[str, Any]:
+        owned = set(self._multiworld.connected(slot)["missing_locations"])
+        if not owned.issuperset(locations):
+            return {
+                "cmd": "InvalidPacket",
+                "type": "arguments",
+                "text": "LocationScouts",
+                "original_cmd": "LocationScouts",
+            }
+        return {"cmd": "LocationInfo", "locations": [self._multiworld.scout(slot, location) for location in locations]}
+
+    async def _replay(self, connection: ServerConnection) -> None:
+        start = time.perf_counter()
+        for frame in self._stream:
+            if self._speed:
+                delay = start + frame.time / self._speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await connection.send(frame.frame)
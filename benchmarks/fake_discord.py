@@ -0,0 +1,215 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import re
+import time
+from collections import defaultdict, deque
+from typing import Any, Self
+
+import discord
+
+from ados.discord.bot import ADOSBot
+
+# Command currently being processed by a simulated user, so API calls can be attributed to it
+current_command: contextvars.ContextVar[str] = contextvars.ContextVar("current_command", default="<none>")
+
+BOT_USER_ID = 1000
+GUILD_ID = 2000
+FIRST_CHANNEL_ID = 3000
+FIRST_USER_ID = 100_000
+
+SNOWFLAKES = itertools.count(10_000_000)
+
+
+def _timestamp() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())
+
+
+def user_payload(user_id: int, *, bot: bool = False) -> dict[str, Any]:
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None, "bot": bot}
+
+
+def message_payload(channel_id: int, author_id: int, content: str, *, bot: bool = False) -> dict[str, Any]:
+    return {
+        "id": str(next(SNOWFLAKES)),
+        "channel_id": str(channel_id),
+        "guild_id": str(GUILD_ID),
+        "author": user_payload(author_id, bot=bot),
+        "content": content,
+        "timestamp": _timestamp(),
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+def thread_payload(thread_id: int, parent_id: int, name: str, *, archived: bool) -> dict[str, Any]:
+    return {
+        "id": str(thread_id),
+        "type": 11,
+        "guild_id": str(GUILD_ID),
+        "parent_id": str(parent_id),
+        "owner_id": str(BOT_USER_ID),
+        "name": name,
+        "last_message_id": None,
+        "message_count": 0,
+        "member_count": 1,
+        "rate_limit_per_user": 0,
+        "thread_metadata": {
+            "archived": archived,
+            "auto_archive_duration": 1440,
+            "archive_timestamp": _timestamp(),
+            "locked": False,
+        },
+    }
+
+
+# Minimal stand-in for the aiohttp response object consumed by discord.http.HTTPClient
+class _FakeResponse:
+
+    def __init__(self, status: int, data: Any, headers: dict[str, str], latency: float):
+        self.status = status
+        self._latency = latency
+        self.reason = "Too Many Requests" if status == 429 else "OK"
+        self.headers = {"content-type": "application/json", "Via": "1.1 fake", **headers}
+        self._text = json.dumps(data)
+
+    async def text(self, encoding: str = "utf-8") -> str:  # pylint: disable = unused-argument
+        return self._text
+
+    async def __aenter__(self) -> Self:
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        pass
+
+
+# Replaces the aiohttp session inside py-cord's HTTP client. Requests never leave the process:
+# they are recorded, answered with synthetic payloads, and subjected to a simple per-route rate
+# limit. Remaining requests are advertised in the rate limit headers unless advertise_limits is
+# off; exceeding the limit produces a real 429 response. Either way, py-cord's own rate limit
+# handling (bucket locks, retry sleeps) runs just like it would against Discord.
+class FakeDiscordSession:
+
+    MESSAGES_REGEX = re.compile(r"/channels/(\d+)/messages$")
+    THREAD_REGEX = re.compile(r"/channels/(\d+)/messages/(\d+)/threads$")
+    CHANNEL_REGEX = re.compile(r"/channels/(\d+)$")
+    DM_REGEX = re.compile(r"/users/@me/channels$")
+
+    def __init__(
+        self, *, latency: float = 0.0, rate_limit: int = 50, rate_window: float = 1.0, advertise_limits: bool = True
+    ):
+        self.closed = False
+        self._advertise_limits = advertise_limits
+        self._latency = latency
+        self._rate_limit = rate_limit
+        self._rate_window = rate_window
+        self._bucket_times: defaultdict[str, deque[float]] = defaultdict(deque)
+        self._threads: dict[int, int] = {}
+
+        self.calls: defaultdict[str, int] = defaultdict(int)
+        self.rate_limited: defaultdict[str, int] = defaultdict(int)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> _FakeResponse:
+        command = current_command.get()
+        self.calls[command] += 1
+
+        bucket = f"{method} {url}"
+        now = time.monotonic()
+        bucket_times = self._bucket_times[bucket]
+        while bucket_times and bucket_times[0] <= now - self._rate_window:
+            bucket_times.popleft()
+        if len(bucket_times) >= self._rate_limit:
+            self.rate_limited[command] += 1
+            retry_after = bucket_times[0] + self._rate_window - now
+            data = {"retry_after": retry_after, "global": False, "message": "You are being rate limited."}
+            return _FakeResponse(429, data, {}, self._latency)
+        bucket_times.append(now)
+
+        headers: dict[str, str] = {}
+        if self._advertise_limits:
+            headers["X-Ratelimit-Remaining"] = str(self._rate_limit - len(bucket_times))
+            headers["X-Ratelimit-Reset-After"] = str(self._rate_window)
+        body = json.loads(kwargs["data"]) if isinstance(kwargs.get("data"), str) else {}
+        return _FakeResponse(200, self._respond(method, url, body), headers, self._latency)
+
+    def _respond(self, method: str, url: str, body: dict[str, Any]) -> Any:
+        if method == "POST" and (match := self.THREAD_REGEX.search(url)):
+            thread_id = next(SNOWFLAKES)
+            self._threads[thread_id] = int(match.group(1))
+            return thread_payload(thread_id, int(match.group(1)), body.get("name", ""), archived=False)
+        if method == "POST" and (match := self.MESSAGES_REGEX.search(url)):
+            return message_payload(int(match.group(1)), BOT_USER_ID, body.get("content") or "", bot=True)
+        if method == "PATCH" and (match := self.CHANNEL_REGEX.search(url)):
+            thread_id = int(match.group(1))
+            parent_id = self._threads.get(thread_id, FIRST_CHANNEL_ID)
+            return thread_payload(thread_id, parent_id, "ArchipelaDOS", archived=bool(body.get("archived")))
+        if method == "POST" and self.DM_REGEX.search(url):
+            recipient = int(body["recipient_id"])
+            return {"id": str(next(SNOWFLAKES)), "type": 1, "recipients": [user_payload(recipient)]}
+        return {}
+
+    def get(self, url: str, **kwargs: Any) -> _FakeResponse:
+        return self.request("GET", url, **kwargs)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+# Wires an ADOSBot to a fake guild and the fake HTTP session, without ever connecting to Discord.
+# Synthetic messages are fed directly into ADOSBot.on_message, exactly as the gateway would.
+class FakeDiscord:
+
+    def __init__(self, bot: ADOSBot, session: FakeDiscordSession, *, server: str, channels: list[str]):
+        self.bot = bot
+        self.session = session
+        self.channel_ids = [FIRST_CHANNEL_ID + index for index in range(len(channels))]
+
+        state = bot._connection  # pylint: disable = protected-access
+        state.application_id = BOT_USER_ID
+        state.user = discord.ClientUser(state=state, data=user_payload(BOT_USER_ID, bot=True))  # type: ignore[arg-type]
+        setattr(bot.http, "_HTTPClient__session", session)
+
+        guild_data: dict[str, Any] = {
+            "id": str(GUILD_ID),
+            "name": server,
+            "owner_id": str(BOT_USER_ID),
+            "roles": [],
+            "emojis": [],
+            "features": [],
+            "member_count": 1,
+            "channels": [
+                {"id": str(channel_id), "type": 0, "name": name, "position": index, "permission_overwrites": []}
+                for index, (channel_id, name) in enumerate(zip(self.channel_ids, channels))
+            ],
+        }
+        self.guild = discord.Guild(data=guild_data, state=state)  # type: ignore[arg-type]
+        state._add_guild(self.guild)  # pylint: disable = protected-access
+
+    async def ready(self) -> None:
+        await self.bot.on_ready()
+
+    def message(self, channel_id: int, author_id: int, content: str) -> discord.Message:
+        channel = self.guild.get_channel(channel_id)
+        assert isinstance(channel, discord.TextChannel)
+        data = message_payload(channel_id, author_id, content)
+        return discord.Message(state=self.bot._connection, channel=channel, data=data)  # type: ignore[arg-type]  # pylint: disable = protected-access
+
+    async def send(self, channel_id: int, author_id: int, content: str) -> None:
+        await self.bot.on_message(self.message(channel_id, author_id, content))
+
+    @staticmethod
+    def user_id(index: int) -> int:
+        return FIRST_USER_ID + index
+
+    def channel_for(self, index: int) -> int:
+        return self.channel_ids[index % len(self.channel_ids)]
@@ -0,0 +1,20 @@
+CURRENT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" >/dev/null 2>&1 && pwd )"
+source "$CURRENT_DIR/common.sh"
+
+make_devenv
+source "$DEVENV_DIR/bin/activate"
+
+# Runs a single benchmark if one is given (e.g. "socket" for benchmarks/bench_socket.py),
+# passing any remaining arguments through, or every benchmark otherwise
+if [[ ! -z "$1" ]]; then
+    BENCHMARK="$1"
+    shift
+    python -m "benchmarks.bench_$BENCHMARK" "$@"
+    exit $?
+fi
+
+for BENCHMARK_PATH in "$ROOT_DIR"/benchmarks/bench_*.py; do
+    BENCHMARK="$( basename "$BENCHMARK_PATH" .py )"
+    header "Running $BENCHMARK"
+    python -m "benchmarks.$BENCHMARK" || exit 1
+done
@@ -5,7 +5,7 @@ make_devenv
 source "$DEVENV_DIR/bin/activate"
 
 header "Sorting imports with isort"
-isort ados/ server.py
+isort ados/ benchmarks/ server.py
 
 header "Performing code formatting with black"
-black ados/ server.py
+black ados/ benchmarks/ server.py
@@ -5,17 +5,17 @@ make_devenv
 source "$DEVENV_DIR/bin/activate"
 
 header "Validating code formatting"
-isort --check-only ados/ server.py
+isort --check-only ados/ benchmarks/ server.py
 ISORT_RET=$?
-black --check ados/ server.py
+black --check ados/ benchmarks/ server.py
 BLACK_RET=$?
 
 header "Validating type hints with mypy"
-mypy ados/ server.py
+mypy ados/ benchmarks/ server.py
 MYPY_RET=$?
 
 header "Validating linting with pylint"
-pylint ados/ server.py
+pylint ados/ benchmarks/ server.py
 PYLINT_RET=$?
 
 if [[ $ISORT_RET -ne 0 || $BLACK_RET -ne 0 || $MYPY_RET -ne 0 || $PYLINT_RET -ne 0 ]]; then
@@ -1,19 +1,21 @@
 import asyncio
 import sys
 
-from ados.config import load_config
-from ados.discord.bot import ADOSBot
-from ados.logger import initialize_logging
-
 DEFAULT_CONFIG_PATH = "config.yaml"
 
 
+# Imports are staged so that usage and configuration errors are reported before the Discord,
+# Archipelago, and HTTP stacks (which dominate startup time) are loaded at all
 async def main() -> None:
+    # pylint: disable = import-outside-toplevel
 
     if len(sys.argv) > 2:
         print("Usage: python server.py [config_path]")
         sys.exit(1)
 
+    from ados.config import load_config
+    from ados.logger import initialize_logging
+
     config_path = sys.argv[1] if len(sys.argv) == 2 else DEFAULT_CONFIG_PATH
     try:
         config = load_config(config_path)
@@ -22,6 +24,8 @@ async def main() -> None:
         print("\n".join(line for line in str(ex).splitlines() if "further information" not in line))
         sys.exit(1)
 
+    from ados.discord.bot import ADOSBot
+
     bot = ADOSBot(config)
     await bot.execute()
 